@@ -1,26 +1,63 @@
 from django.contrib import admin
-from .models import Post, Group, Comment
+from .models import Post, Group, Comment, ArchivedPost
+from .paginators import EstimatedCountPaginator
+from .search import fulltext_filter, is_fulltext_available
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """
+    Поиск по полнотекстовому индексу вместо LIKE '%...%'.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        # в строке из одних пробелов нет слов, а пустой MATCH — ошибка FTS5
+        if (not search_term.strip()
+                or not is_fulltext_available(queryset.db)):
+            return super().get_search_results(request, queryset, search_term)
+        return fulltext_filter(queryset, search_term), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('text', 'pub_date', 'author')
+    list_select_related = ('author',)
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug',)
     search_fields = ('title',)
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('text', 'author', 'post', 'created')
+    list_select_related = ('author', 'post')
     search_fields = ('text',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('author', 'post')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = ('text', 'pub_date', 'author', 'archived')
+    list_select_related = ('author',)
+    search_fields = ('=id',)
+    raw_id_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
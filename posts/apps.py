@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+from yatube.sqlite import apply_pragmas
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa
+        from .search import ensure_fulltext_index
+        post_migrate.connect(ensure_fulltext_index, sender=self)
+        connection_created.connect(apply_pragmas)
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+COMMENT_CHUNK_SIZE = 500
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Переносит в архив одну пачку постов старше cutoff вместе
+    с комментариями. Возвращает число перенесенных постов.
+    """
+    with transaction.atomic():
+        posts = list(Post.objects.filter(pub_date__lt=cutoff)
+                     .order_by('pub_date')[:batch_size])
+        if not posts:
+            return 0
+        ids = [post.id for post in posts]
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=post.id, text=post.text, pub_date=post.pub_date,
+                         author_id=post.author_id, group_id=post.group_id,
+                         image=post.image, views=post.views)
+            for post in posts])
+        comments = Comment.objects.filter(post_id__in=ids).order_by()
+        ArchivedComment.objects.bulk_create(
+            (ArchivedComment(id=comment.id, post_id=comment.post_id,
+                             author_id=comment.author_id, text=comment.text,
+                             created=comment.created)
+             for comment in comments.iterator(chunk_size=COMMENT_CHUNK_SIZE)),
+            batch_size=COMMENT_CHUNK_SIZE)
+        Comment.objects.filter(post_id__in=ids).delete()
+        Post.objects.filter(pk__in=ids).delete()
+    return len(posts)
+
+
+def get_post_or_404(author, post_id):
+    """
+    Ищет пост сначала в рабочей таблице, затем в архиве.
+    """
+    post = Post.objects.filter(id=post_id, author=author).first()
+    if post is None:
+        post = get_object_or_404(ArchivedPost, id=post_id, author=author)
+    post.author = author
+    return post
+
+
+class ArchiveFallbackList:
+    """
+    Список для Paginator: сначала посты из рабочей таблицы, за ними
+    архивные. Архив запрашивается, только когда страница до него дошла.
+    """
+
+    def __init__(self, hot, cold):
+        self.hot = hot
+        self.cold = cold
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    def count(self):
+        return self.hot_count + self.cold.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        items = []
+        if start < self.hot_count:
+            items.extend(self.hot[start:stop])
+        cold_start = max(start - self.hot_count, 0)
+        cold_stop = None if stop is None else stop - self.hot_count
+        if cold_stop is None or cold_stop > 0:
+            items.extend(self.cold[cold_start:cold_stop])
+        return items
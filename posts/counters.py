@@ -0,0 +1,101 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent import futures
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+from yatube.sqlite import write_queue
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# сколько постов обновляется одним UPDATE
+FLUSH_CHUNK_SIZE = 500
+
+
+class ViewCounter:
+    """
+    Копит просмотры постов в памяти процесса и периодически записывает их
+    в базу пачкой из фонового потока, чтобы чтение не делало записей.
+    При падении процесса теряются только просмотры последнего интервала.
+    """
+
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._started = False
+
+    def start(self):
+        """
+        Включает фоновую запись и запись при выходе. Вызывается только
+        из точки входа сервера (yatube/wsgi.py): в тестах и командах
+        просмотры копятся в памяти, пока их не запишет явный flush().
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        atexit.register(self.flush)
+
+    def record(self, post_id):
+        with self._lock:
+            if self._started and self._pid != os.getpid():
+                # после fork счетчики и поток родителя недействительны
+                self._pid = os.getpid()
+                self._pending = Counter()
+                self._start_flusher()
+            self._pending[post_id] += 1
+
+    def pending(self, post_id):
+        return self._pending.get(post_id, 0)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+        if not batch:
+            return 0
+        items = list(batch.items())
+        try:
+            write_queue.submit(self._write, items)
+        except (DatabaseError, futures.TimeoutError):
+            logger.exception('Failed to flush %s post view counters',
+                             len(items))
+            with self._lock:
+                self._pending.update(batch)
+            return 0
+        return len(items)
+
+    @staticmethod
+    def _write(items):
+        for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+            chunk = items[start:start + FLUSH_CHUNK_SIZE]
+            increment = Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in chunk],
+                output_field=IntegerField())
+            Post.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                views=F('views') + increment)
+
+    def _start_flusher(self):
+        interval = settings.POST_VIEWS_FLUSH_INTERVAL
+        if not interval:
+            return
+        thread = threading.Thread(target=self._run_flusher, args=(interval,),
+                                  name='post-views-flusher', daemon=True)
+        thread.start()
+
+    def _run_flusher(self, interval):
+        pid = os.getpid()
+        stop = threading.Event()
+        while not stop.wait(interval) and pid == self._pid:
+            close_old_connections()
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,95 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_image
+
+from tasks.models import Task
+from tasks.queue import enqueue
+from .models import (ArchivedComment, ArchivedPost, Comment, Follow, Post,
+                     User)
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_user_deletion(user):
+    """
+    Сразу отключает аккаунт, а данные удаляет в фоне.
+    """
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    # повторно не ставим, только пока прежняя задача не выполнена:
+    # после отмены удаления и новой просьбы нужна новая задача
+    active = Task.objects.filter(
+        idempotency_key__startswith=f'purge_user:{user.pk}:',
+        status__in=(Task.QUEUED, Task.RUNNING)).first()
+    if active is not None:
+        return active
+    return enqueue('posts.purge_user', priority=-1,
+                   idempotency_key=f'purge_user:{user.pk}:'
+                                   f'{timezone.now().timestamp()}',
+                   user_id=user.pk)
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    Удаляет строки выборки пачками, каждая в своей транзакции, чтобы
+    не держать блокировку записи SQLite надолго.
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[
+            :batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def delete_posts_in_batches(queryset, batch_size):
+    comment_model = queryset.model.comments.field.model
+    deleted = 0
+    while True:
+        batch = list(queryset.order_by().values_list('pk', 'image')[
+            :batch_size])
+        if not batch:
+            return deleted
+        ids = [pk for pk, _ in batch]
+        with transaction.atomic():
+            comment_model.objects.filter(post_id__in=ids).delete()
+            queryset.model.objects.filter(pk__in=ids).delete()
+        images = [image for _, image in batch if image]
+        if images:
+            enqueue('posts.delete_media', priority=-2, names=images)
+        deleted += len(ids)
+
+
+def purge_user(user_id):
+    user = User.objects.filter(pk=user_id, is_active=False).first()
+    if user is None:
+        # аккаунт уже удален или снова включен
+        return
+    batch_size = settings.USER_PURGE_BATCH_SIZE
+    delete_in_batches(Comment.objects.filter(author_id=user_id), batch_size)
+    delete_in_batches(ArchivedComment.objects.filter(author_id=user_id),
+                      batch_size)
+    delete_in_batches(Follow.objects.filter(user_id=user_id), batch_size)
+    delete_in_batches(Follow.objects.filter(author_id=user_id), batch_size)
+    delete_posts_in_batches(Post.objects.filter(author_id=user_id),
+                            batch_size)
+    delete_posts_in_batches(ArchivedPost.objects.filter(author_id=user_id),
+                            batch_size)
+    user.delete()
+
+
+def delete_media(names):
+    """
+    Удаляет файлы изображений вместе с миниатюрами sorl и их ключами.
+    """
+    for name in names:
+        try:
+            delete_image(name)
+        except Exception:
+            logger.exception('Failed to delete media file %s', name)
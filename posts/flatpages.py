@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.flatpages.views import flatpage
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from yatube.middleware import parse_accept_encoding
+
+VERSION_KEY = 'flatpages:version'
+
+# версия из общего кэша и момент, до которого ей можно верить
+_version = (None, 0)
+
+
+def get_version():
+    """
+    Версия ключей страниц из общего для всех процессов кэша. Чтобы не
+    ходить за ней на каждый запрос, процесс помнит ее
+    FLATPAGE_VERSION_CHECK_INTERVAL секунд: столько другие воркеры могут
+    отдавать старую страницу после правки.
+    """
+    global _version
+    version, expires = _version
+    if version is not None and time.monotonic() < expires:
+        return version
+    shared = caches['shared']
+    version = shared.get(VERSION_KEY)
+    if version is None:
+        shared.add(VERSION_KEY, 1, None)
+        version = shared.get(VERSION_KEY, 1)
+    _version = (version, time.monotonic()
+                + settings.FLATPAGE_VERSION_CHECK_INTERVAL)
+    return version
+
+
+def invalidate():
+    """
+    Сбрасывает все закэшированные страницы сменой версии ключей.
+    """
+    global _version
+    shared = caches['shared']
+    try:
+        shared.incr(VERSION_KEY)
+    except ValueError:
+        shared.set(VERSION_KEY, 1, None)
+    _version = (None, 0)
+
+
+def render_entry(request, url):
+    """
+    Рендерит страницу и готовит запись кэша: HTML, его gzip и ETag.
+    Возвращает None, если страницу кэшировать нельзя.
+    """
+    response = flatpage(request, url)
+    if response.status_code != 200:
+        return None, response
+    content = response.content
+    entry = {'content': content,
+             'gzip': gzip.compress(content, mtime=0),
+             'content_type': response['Content-Type'],
+             'etag': '"{}"'.format(hashlib.md5(content).hexdigest())}
+    return entry, response
+
+
+def build_response(request, entry):
+    """
+    Выбирает вариант по Accept-Encoding и только потом проверяет
+    If-None-Match: у сжатого варианта свой ETag, иначе кэш мог бы
+    ответить 304 на тело не в той кодировке.
+    """
+    accepted = parse_accept_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    use_gzip = accepted.get('gzip', 0) > 0
+    etag = entry['etag']
+    if use_gzip:
+        etag = etag[:-1] + '-gzip"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = entry['gzip'] if use_gzip else entry['content']
+        response = HttpResponse(content, content_type=entry['content_type'])
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return response
+
+
+def cached_flatpage(request, url):
+    """
+    Отдает статическую страницу анонимам из кэша готового HTML без
+    обращений к базе и рендера. Для вошедших пользователей шапка
+    персональная, поэтому страница рендерится как обычно.
+    """
+    if request.user.is_authenticated:
+        return flatpage(request, url)
+    if not url.startswith('/'):
+        url = '/' + url
+    key = f'flatpage:{get_version()}:{settings.SITE_ID}:{url}'
+    entry = cache.get(key)
+    if entry is None:
+        entry, response = render_entry(request, url)
+        if entry is None:
+            return response
+        cache.set(key, entry, settings.FLATPAGE_CACHE_TIMEOUT)
+    return build_response(request, entry)
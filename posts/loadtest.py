@@ -0,0 +1,111 @@
+"""
+Клиентская часть нагрузочного теста. Модуль не зависит от Django, чтобы
+процессы-клиенты запускались быстро и не делили состояние с сервером.
+"""
+import http.client
+import random
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+
+def parse_mix(mix):
+    """
+    'index=60,post=25' -> [('index', 60), ('post', 25)]
+    """
+    result = []
+    for item in mix.split(','):
+        name, weight = item.split('=')
+        result.append((name.strip(), float(weight)))
+    return result
+
+
+class LoadClient:
+    def __init__(self, host, port, session_cookie, targets, seed):
+        self.host = host
+        self.port = port
+        self.cookies = {'sessionid': session_cookie}
+        self.targets = targets
+        self.random = random.Random(seed)
+
+    def request(self, method, path, data=None):
+        connection = http.client.HTTPConnection(self.host, self.port,
+                                                timeout=30)
+        headers = {'Cookie': '; '.join(f'{key}={value}' for key, value
+                                       in self.cookies.items())}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            for header in response.headers.get_all('Set-Cookie') or []:
+                cookie = SimpleCookie(header)
+                for key, morsel in cookie.items():
+                    self.cookies[key] = morsel.value
+            return response.status
+        finally:
+            connection.close()
+
+    def post_path(self):
+        username, post_id = self.random.choice(self.targets['posts'])
+        return f'/{username}/{post_id}/'
+
+    def author_path(self, suffix):
+        username = self.random.choice(self.targets['authors'])
+        return f'/{username}/{suffix}/'
+
+    def run_action(self, action):
+        if action == 'index':
+            return self.request('GET', '/')
+        if action == 'post':
+            return self.request('GET', self.post_path())
+        if action == 'comment':
+            return self.request('POST', self.post_path() + 'comment',
+                                {'text': 'Нагрузочный комментарий'})
+        if action == 'new_post':
+            return self.request('POST', '/new/',
+                                {'text': 'Нагрузочный пост'})
+        if action == 'follow':
+            return self.request('GET', self.author_path('follow'))
+        if action == 'unfollow':
+            return self.request('GET', self.author_path('unfollow'))
+        raise ValueError(f'Unknown action {action!r}')
+
+
+def run_client(options):
+    """
+    Точка входа процесса-клиента. Возвращает список
+    (время от старта, действие, задержка, успех).
+    """
+    client = LoadClient(options['host'], options['port'],
+                        options['session'], options['targets'],
+                        options['seed'])
+    # страница с формой выставляет cookie csrftoken для POST-запросов
+    client.request('GET', '/new/')
+    time.sleep(max(0, options['started'] - time.time()))
+    names, weights = zip(*options['mix'])
+    results = []
+    started = options['started']
+    deadline = started + options['duration']
+    while time.time() < deadline:
+        action = client.random.choices(names, weights)[0]
+        begin = time.time()
+        try:
+            status = client.run_action(action)
+            ok = status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+        results.append((begin - started, action, time.time() - begin, ok))
+    return results
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    index = min(int(len(values) * fraction), len(values) - 1)
+    return values[index]
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Group, User
+
+# маркер в кэше для объектов, которых нет в базе
+MISSING = '<missing>'
+
+
+class ObjectCache:
+    """
+    Кэш объектов модели по уникальному полю с кэшированием промахов.
+    Хранятся только поля fields, остальные загружаются из базы при
+    обращении. Сигналы сбрасывают кэш только в своем процессе, в других
+    воркерах запись живет до OBJECT_CACHE_TIMEOUT.
+    """
+
+    def __init__(self, model, field, fields):
+        self.model = model
+        self.field = field
+        self.fields = ('pk',) + tuple(fields)
+
+    def make_key(self, value):
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f'objcache:{self.model._meta.label_lower}:{self.field}:{digest}'
+
+    def get(self, value):
+        key = self.make_key(value)
+        obj = cache.get(key)
+        if obj == MISSING:
+            raise self.model.DoesNotExist
+        if obj is None:
+            try:
+                obj = self.model.objects.values_list(*self.fields).get(
+                    **{self.field: value})
+            except self.model.DoesNotExist:
+                cache.set(key, MISSING, settings.OBJECT_CACHE_MISSING_TIMEOUT)
+                raise
+            cache.set(key, obj, settings.OBJECT_CACHE_TIMEOUT)
+        names = [self.model._meta.pk.attname] + list(self.fields[1:])
+        return self.model.from_db(self.model.objects.db, names, obj)
+
+    def get_or_404(self, value):
+        try:
+            return self.get(value)
+        except self.model.DoesNotExist:
+            raise Http404(f'No {self.model._meta.object_name} '
+                          f'matches the given query.')
+
+    def invalidate(self, *values):
+        cache.delete_many([self.make_key(value) for value in values])
+
+
+# без пароля и прав: странице нужны только имя и адрес
+users_by_username = ObjectCache(User, 'username',
+                                ('username', 'first_name', 'last_name'))
+groups_by_slug = ObjectCache(Group, 'slug', ('title', 'slug', 'description'))
+
+OBJECT_CACHES = {
+    User: users_by_username,
+    Group: groups_by_slug,
+}
+
+
+def get_user_or_404(username):
+    return users_by_username.get_or_404(username)
+
+
+def get_group_or_404(slug):
+    return groups_by_slug.get_or_404(slug)
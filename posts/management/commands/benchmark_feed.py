@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+INCLUDE_LOOP = ('{% for post in page %}'
+                '{% include "includes/post_block.html" with post=post %}'
+                '{% endfor %}')
+RENDER_FEED = '{% load feed %}{% render_feed page %}'
+
+
+def make_posts(count):
+    """
+    Посты в памяти, без базы: замер касается только шаблонов.
+    """
+    author = User(id=1, username='benchmark')
+    group = Group(id=1, title='Benchmark', slug='benchmark')
+    posts = []
+    for number in range(1, count + 1):
+        post = Post(id=number, text=f'Пост номер {number}\nвторая строка',
+                    author=author, group=group, pub_date=timezone.now())
+        post.comment_count = number % 3
+        posts.append(post)
+    return posts
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендера ленты через {% include %} в цикле '
+            'и через {% render_feed %} на разных размерах страницы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,20,50,100',
+                            help='Размеры страницы через запятую')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Сколько раз рендерить каждую страницу')
+
+    def handle(self, *args, **options):
+        engine = engines['django']
+        variants = [('include', engine.from_string(INCLUDE_LOOP)),
+                    ('render_feed', engine.from_string(RENDER_FEED))]
+        self.stdout.write('постов'.rjust(8) + ''.join(
+            f'{name}, мкс/пост'.rjust(24) for name, _ in variants))
+        for size in map(int, options['sizes'].split(',')):
+            context = {'page': make_posts(size), 'user': AnonymousUser()}
+            row = str(size).rjust(8)
+            for _, template in variants:
+                template.render(context)
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    template.render(context)
+                elapsed = time.perf_counter() - started
+                per_post = elapsed / options['repeat'] / size * 1e6
+                row += f'{per_post:24.1f}'
+            self.stdout.write(row)
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from posts.loadtest import percentile
+from posts.models import Comment, Post, User
+from yatube.sqlite import database_copy, write_queue
+
+MODES = ('default', 'production')
+
+
+class Command(BaseCommand):
+    help = ('Пропускная способность чтения и записи SQLite при смешанной '
+            'нагрузке: обычный режим против боевого (WAL, PRAGMA, '
+            'очередь записи). Замеры идут на временной копии базы, '
+            'рабочая база не меняется')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Длительность прогона, с')
+        parser.add_argument('--modes', default=','.join(MODES),
+                            help='Режимы через запятую: default, production')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда замеряет только SQLite')
+        self.stdout.write(
+            f'{"режим":<12} {"чтений/с":>10} {"записей/с":>10} '
+            f'{"p95 записи мс":>14} {"ошибок":>7}')
+        with database_copy():
+            user, _ = User.objects.get_or_create(username='sqlite_benchmark')
+            post = (Post.objects.filter(author=user).first()
+                    or Post.objects.create(author=user,
+                                           text='Пост для замеров'))
+            for mode in options['modes'].split(','):
+                stats = self.run_mode(mode, post, user, options)
+                self.report(mode, stats, options['duration'])
+
+    def run_mode(self, mode, post, user, options):
+        production = mode == 'production'
+        connections.close_all()
+        connections.databases['default']['CONN_MAX_AGE'] = (
+            600 if production else 0)
+        with override_settings(SQLITE_PRODUCTION=production,
+                               WRITE_QUEUE_ENABLED=production):
+            if not production:
+                # WAL сохраняется в файле копии, возвращаем обычный журнал
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode = delete')
+            try:
+                return self.run(post, user, options)
+            finally:
+                connections.close_all()
+
+    def run(self, post, user, options):
+        stats = {'reads': 0, 'writes': [], 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.time() + options['duration']
+
+        def reader():
+            try:
+                while time.time() < deadline:
+                    try:
+                        list(Post.objects.select_related('author', 'group')
+                             [:10])
+                        Post.objects.count()
+                    except OperationalError:
+                        with lock:
+                            stats['errors'] += 1
+                        continue
+                    with lock:
+                        stats['reads'] += 1
+            finally:
+                connection.close()
+
+        def writer():
+            try:
+                while time.time() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        write_queue.submit(Comment.objects.create, post=post,
+                                           author=user, text='Замер')
+                    except OperationalError:
+                        with lock:
+                            stats['errors'] += 1
+                        continue
+                    with lock:
+                        stats['writes'].append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = ([threading.Thread(target=reader)
+                    for _ in range(options['readers'])]
+                   + [threading.Thread(target=writer)
+                      for _ in range(options['writers'])])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def report(self, mode, stats, duration):
+        writes = stats['writes']
+        self.stdout.write(
+            f'{mode:<12} {stats["reads"] / duration:>10.1f} '
+            f'{len(writes) / duration:>10.1f} '
+            f'{percentile(writes, 0.95) * 1000:>14.1f} '
+            f'{stats["errors"]:>7}')
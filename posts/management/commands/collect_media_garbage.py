@@ -0,0 +1,123 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default as thumbnail_default
+from sorl.thumbnail import delete as delete_image
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import ArchivedPost, Post
+
+
+def walk_files(root):
+    """
+    Обходит дерево каталогов потоком, не собирая список файлов в памяти.
+    Отдает пары (путь относительно root, os.DirEntry).
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def referenced_images(names):
+    """
+    Какие из имен записаны в постах. Поиск идет по индексу на image;
+    сортировку модели нужно убрать, иначе SQLite обходит всю таблицу
+    по индексу pub_date.
+    """
+    referenced = set()
+    for model in (Post, ArchivedPost):
+        referenced.update(model.objects.filter(image__in=names).order_by()
+                          .values_list('image', flat=True))
+    return referenced
+
+
+def referenced_thumbnails(names):
+    return {name for name in names
+            if thumbnail_default.kvstore.get(
+                ImageFile(name, default_storage)) is not None}
+
+
+class Command(BaseCommand):
+    help = ('Находит и удаляет файлы изображений постов и миниатюры, '
+            'на которые больше ничего не ссылается')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Файлов в одной проверке по базе')
+        parser.add_argument('--rate', type=float, default=0,
+                            help='Не больше стольких удалений в секунду')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд')
+        parser.add_argument('--cleanup-kvstore', action='store_true',
+                            help='Сначала удалить из kvstore sorl ссылки '
+                                 'на несуществующие файлы')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.deadline = time.time() - options['min_age']
+        self.stats = {'checked': 0, 'orphans': 0, 'bytes': 0}
+        if options['cleanup_kvstore'] and not options['dry_run']:
+            thumbnail_default.kvstore.cleanup()
+        upload_to = Post._meta.get_field('image').upload_to
+        self.collect(upload_to, referenced_images, delete_image)
+        self.collect(thumbnail_settings.THUMBNAIL_PREFIX,
+                     referenced_thumbnails, default_storage.delete)
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            f'Проверено файлов: {self.stats["checked"]}. {action} '
+            f'лишних: {self.stats["orphans"]}, {self.stats["bytes"]} байт')
+
+    def collect(self, prefix, find_referenced, delete):
+        root = os.path.join(settings.MEDIA_ROOT, prefix)
+        for entries in chunked(walk_files(root),
+                               self.options['chunk_size']):
+            names = {
+                os.path.relpath(entry.path,
+                                settings.MEDIA_ROOT).replace(os.sep, '/'):
+                entry
+                for entry in entries}
+            self.stats['checked'] += len(names)
+            referenced = find_referenced(list(names))
+            for name, entry in names.items():
+                if name in referenced:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > self.deadline:
+                    continue
+                self.remove(name, stat.st_size, delete)
+
+    def remove(self, name, size, delete):
+        self.stats['orphans'] += 1
+        self.stats['bytes'] += size
+        if self.options['verbosity'] > 1:
+            self.stdout.write(name)
+        if self.options['dry_run']:
+            return
+        delete(name)
+        if self.options['rate']:
+            time.sleep(1 / self.options['rate'])
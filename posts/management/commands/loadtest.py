@@ -0,0 +1,187 @@
+import multiprocessing
+import socketserver
+import threading
+import time
+from collections import defaultdict
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection
+from django.test import Client
+
+from posts.loadtest import parse_mix, percentile, run_client
+from posts.models import Post, User
+from yatube.sqlite import database_copy
+
+DEFAULT_MIX = ('index=50,post=30,comment=8,new_post=4,follow=4,unfollow=4')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+# время на запуск процессов-клиентов, чтобы оно не попало в замеры
+SPAWN_GRACE = 2
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class LockStats:
+    """
+    Время, проведенное сервером в пишущих запросах к базе, и число ошибок
+    'database is locked' по секундам теста. В SQLite ожидание блокировки
+    записи происходит внутри execute, поэтому это и есть время ожидания.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(time.time())
+
+    def reset(self, started):
+        with self.lock:
+            self.started = started
+            self.wait = defaultdict(float)
+            self.locked = defaultdict(int)
+
+    def wrapper(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+            return execute(sql, params, many, context)
+        begin = time.time()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if 'locked' in str(error):
+                with self.lock:
+                    self.locked[int(begin - self.started)] += 1
+            raise
+        finally:
+            with self.lock:
+                self.wait[int(begin - self.started)] += time.time() - begin
+
+    def application(self, application):
+        def instrumented(environ, start_response):
+            with connection.execute_wrapper(self.wrapper):
+                return application(environ, start_response)
+        return instrumented
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест: поднимает локальный WSGI-сервер и гоняет '
+            'на нем смесь запросов из пула процессов-клиентов. Тестовые '
+            'пользователи, посты и записи клиентов попадают во временную '
+            'копию базы, рабочая база не меняется')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', default='1,2,4,8',
+                            help='Числа клиентов через запятую, '
+                                 'для каждого отдельный прогон')
+        parser.add_argument('--duration', type=float, default=20,
+                            help='Длительность прогона, с')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Шаг отчета по времени, с')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Смесь запросов: действие=вес,...')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько тестовых пользователей создать')
+        parser.add_argument('--port', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Нагрузочный тест работает только с SQLite')
+        # иначе ограничитель частоты отбросит почти всю запись
+        settings.RATELIMIT_ENABLED = False
+        with database_copy():
+            self.run(options)
+
+    def run(self, options):
+        sessions, targets = self.prepare_data(options['users'])
+        mix = parse_mix(options['mix'])
+
+        application = get_wsgi_application()
+        stats = LockStats()
+        server = make_server('127.0.0.1', options['port'],
+                             stats.application(application),
+                             server_class=ThreadingWSGIServer,
+                             handler_class=QuietHandler)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.stdout.write(f'Сервер: http://127.0.0.1:{port}/')
+
+        context = multiprocessing.get_context('spawn')
+        try:
+            for clients in map(int, options['clients'].split(',')):
+                started = time.time() + SPAWN_GRACE
+                stats.reset(started)
+                jobs = [{'host': '127.0.0.1', 'port': port,
+                         'session': sessions[number % len(sessions)],
+                         'targets': targets, 'mix': mix, 'seed': number,
+                         'started': started,
+                         'duration': options['duration']}
+                        for number in range(clients)]
+                with context.Pool(clients) as pool:
+                    results = [row for rows in pool.map(run_client, jobs)
+                               for row in rows]
+                self.report(clients, results, stats, options)
+        finally:
+            server.shutdown()
+
+    def prepare_data(self, count):
+        users = []
+        for number in range(count):
+            user, _ = User.objects.get_or_create(
+                username=f'loadtest_{number}')
+            users.append(user)
+            if not user.posts.exists():
+                Post.objects.create(author=user,
+                                    text=f'Пост для нагрузки {number}')
+        sessions = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            sessions.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+        posts = list(Post.objects.filter(author__in=users)
+                     .values_list('author__username', 'id')[:1000])
+        targets = {'posts': posts,
+                   'authors': [user.username for user in users]}
+        return sessions, targets
+
+    def report(self, clients, results, stats, options):
+        interval = options['interval']
+        self.stdout.write(f'\nКлиентов: {clients}')
+        self.stdout.write(
+            f'{"t, с":>6} {"запр/с":>8} {"p50 мс":>8} {"p95 мс":>8} '
+            f'{"p99 мс":>8} {"ошибки":>7} {"блок мс":>8} {"locked":>7}')
+        buckets = defaultdict(list)
+        for offset, _, latency, ok in results:
+            buckets[int(offset // interval)].append((latency, ok))
+        for bucket in sorted(buckets):
+            rows = buckets[bucket]
+            latencies = [latency for latency, _ in rows]
+            errors = sum(1 for _, ok in rows if not ok)
+            seconds = range(int(bucket * interval),
+                            int((bucket + 1) * interval))
+            wait = sum(stats.wait.get(second, 0) for second in seconds)
+            locked = sum(stats.locked.get(second, 0) for second in seconds)
+            self.stdout.write(
+                f'{bucket * interval:>6.0f} {len(rows) / interval:>8.1f} '
+                f'{percentile(latencies, 0.5) * 1000:>8.1f} '
+                f'{percentile(latencies, 0.95) * 1000:>8.1f} '
+                f'{percentile(latencies, 0.99) * 1000:>8.1f} '
+                f'{errors / len(rows):>7.1%} {wait * 1000:>8.0f} '
+                f'{locked:>7}')
+        by_action = defaultdict(list)
+        for _, action, latency, ok in results:
+            by_action[action].append((latency, ok))
+        for action, rows in sorted(by_action.items()):
+            latencies = [latency for latency, _ in rows]
+            errors = sum(1 for _, ok in rows if not ok)
+            self.stdout.write(
+                f'  {action:<10} {len(rows):>6} запр, '
+                f'p95 {percentile(latencies, 0.95) * 1000:.1f} мс, '
+                f'ошибок {errors}')
+        total = len(results) / options['duration'] if results else 0
+        self.stdout.write(f'Итого: {total:.1f} запр/с')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from yatube import warmup
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время этапов холодного старта воркера: '
+            'первый прогон холодный, следующие уже прогретые')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2,
+                            help='Сколько раз выполнить этапы')
+
+    def handle(self, *args, **options):
+        runs = [warmup.run_stages() for _ in range(max(options['repeat'], 1))]
+        header = 'этап'.ljust(12) + ''.join(
+            f'прогон {number}'.rjust(12) for number in range(1, len(runs) + 1))
+        self.stdout.write(header)
+        for name, _ in warmup.STAGES:
+            row = name.ljust(12) + ''.join(
+                f'{run[name] * 1000:10.2f}мс' for run in runs)
+            self.stdout.write(row)
+        self.stdout.write('итого'.ljust(12) + ''.join(
+            f'{sum(run.values()) * 1000:10.2f}мс' for run in runs))
@@ -0,0 +1,109 @@
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts.models import Group, Post, User
+from posts.tasks import THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS
+from posts.views import POST_ON_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кэши после деплоя: создает миниатюры постов первых '
+            'страниц лент и, если задан --url, запрашивает эти страницы '
+            'у работающего сервера. Кэши LocMem у каждого воркера свои, '
+            'поэтому запросы прогревают только принявшие их воркеры, '
+            'а также файловый кэш ОС для базы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько первых страниц каждой ленты')
+        parser.add_argument('--profiles', type=int, default=50,
+                            help='Сколько самых популярных профилей')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Число одновременных запросов')
+        parser.add_argument('--budget', type=float, default=60,
+                            help='Ограничение по времени, с')
+        parser.add_argument('--url', default=None,
+                            help='Адрес работающего сервера, например '
+                                 'http://127.0.0.1:8000; без него страницы '
+                                 'не запрашиваются')
+        parser.add_argument('--host', default=None,
+                            help='Значение заголовка Host для запросов')
+
+    def handle(self, *args, **options):
+        self.deadline = time.monotonic() + options['budget']
+        self.base_url = (options['url'] or '').rstrip('/')
+        self.host = options['host'] or next(
+            (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+            None)
+        self.stats = {'pages': 0, 'thumbnails': 0, 'errors': 0,
+                      'skipped': 0}
+        self.stats_lock = threading.Lock()
+        pages = options['pages']
+        feeds = [(reverse('index'), Post.objects.all())]
+        for group in Group.objects.all():
+            feeds.append((reverse('group', args=[group.slug]),
+                          group.posts.all()))
+        popular = User.objects.annotate(
+            followers=Count('following')
+        ).order_by('-followers')[:options['profiles']]
+        for user in popular:
+            feeds.append((reverse('profile', args=[user.username]),
+                          user.posts.all()))
+
+        jobs = []
+        if self.base_url:
+            jobs = [(self.warm_page, f'{url}?page={number}')
+                    for url, _ in feeds for number in range(1, pages + 1)]
+        limit = pages * POST_ON_PAGE
+        for _, queryset in feeds:
+            images = queryset.exclude(image='').exclude(
+                image__isnull=True).values_list('image', flat=True)[:limit]
+            jobs.extend((self.warm_thumbnail, name) for name in images)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(lambda job: self.run_job(*job), jobs))
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Страниц: {self.stats["pages"]}, миниатюр: '
+            f'{self.stats["thumbnails"]}, ошибок: {self.stats["errors"]}, '
+            f'пропущено по времени: {self.stats["skipped"]}, '
+            f'за {elapsed:.1f} с')
+
+    def run_job(self, func, argument):
+        if time.monotonic() > self.deadline:
+            self.count('skipped')
+            return
+        try:
+            func(argument)
+        except Exception as error:
+            self.count('errors')
+            self.stderr.write(f'{argument}: {error}')
+        finally:
+            connection.close()
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def warm_page(self, url):
+        request = urllib.request.Request(self.base_url + url)
+        if self.host:
+            request.add_header('Host', self.host)
+        # ошибочный статус urlopen поднимает как HTTPError
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+        self.count('pages')
+
+    def warm_thumbnail(self, name):
+        get_thumbnail(name, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+        self.count('thumbnails')
@@ -21,7 +21,8 @@ class Group(models.Model):
 
 class Post(models.Model):
     text = models.TextField(verbose_name='Пост')
-    pub_date = models.DateTimeField('date published', auto_now_add=True)
+    pub_date = models.DateTimeField('date published', auto_now_add=True,
+                                    db_index=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='posts',
                                verbose_name='Автор')
@@ -29,7 +30,11 @@ class Post(models.Model):
                               null=True, related_name='posts',
                               verbose_name='Группа')
     image = models.ImageField(upload_to='posts/', blank=True, null=True,
-                              verbose_name='Изображение')
+                              db_index=True, verbose_name='Изображение')
+    views = models.PositiveIntegerField(default=0, editable=False,
+                                        verbose_name='Просмотры')
+
+    is_archived = False
 
     class Meta:
         ordering = ['-pub_date', ]
@@ -50,7 +55,8 @@ class Comment(models.Model):
                                null=False, related_name='comments',
                                verbose_name='Автор комментария')
     text = models.TextField(verbose_name='Комментарий')
-    created = models.DateTimeField('date created', auto_now_add=True)
+    created = models.DateTimeField('date created', auto_now_add=True,
+                                   db_index=True)
 
     class Meta:
         ordering = ['-created', ]
@@ -75,3 +81,53 @@ class Follow(models.Model):
         unique_together = ['user', 'author']
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class ArchivedPost(models.Model):
+    id = models.IntegerField(primary_key=True, verbose_name='ID')
+    text = models.TextField(verbose_name='Пост')
+    pub_date = models.DateTimeField('date published', db_index=True)
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='archived_posts',
+                               verbose_name='Автор')
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, blank=True,
+                              null=True, related_name='archived_posts',
+                              verbose_name='Группа')
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              db_index=True, verbose_name='Изображение')
+    views = models.PositiveIntegerField(default=0, verbose_name='Просмотры')
+    archived = models.DateTimeField('date archived', auto_now_add=True)
+
+    is_archived = True
+
+    class Meta:
+        ordering = ['-pub_date', ]
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архивные посты'
+
+    def __str__(self):
+        if len(self.text) > MAX_TEXT_LENGTH:
+            return self.text[:MAX_TEXT_LENGTH] + '...'
+        return self.text
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True, verbose_name='ID')
+    post = models.ForeignKey(ArchivedPost, on_delete=models.CASCADE,
+                             related_name='comments',
+                             verbose_name='Пост')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='archived_comments',
+                               verbose_name='Автор комментария')
+    text = models.TextField(verbose_name='Комментарий')
+    created = models.DateTimeField('date created')
+
+    class Meta:
+        ordering = ['-created', ]
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+
+    def __str__(self):
+        if len(self.text) > MAX_TEXT_LENGTH:
+            return self.text[:MAX_TEXT_LENGTH] + '...'
+        return self.text
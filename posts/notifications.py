@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from tasks.queue import enqueue
+from .models import Post, Follow
+
+DIGEST_SUBJECT = 'Новые записи от ваших авторов'
+DIGEST_TEMPLATE = 'emails/digest.txt'
+
+
+def get_digest_window(moment):
+    """
+    Возвращает границы окна [since, until), в которое попадает moment.
+    """
+    length = settings.DIGEST_WINDOW
+    timestamp = int(moment.timestamp()) // length * length
+    since = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return since, since + timedelta(seconds=length)
+
+
+def schedule_digest(post):
+    since, until = get_digest_window(post.pub_date)
+    enqueue('posts.send_digests',
+            idempotency_key=f'digest:{since.isoformat()}',
+            delay=until - timezone.now(),
+            since=since.isoformat(),
+            until=until.isoformat())
+
+
+def collect_digests(since, until):
+    """
+    Отдает пары (подписчик, список новых постов его авторов) за окно.
+    Посты окна держатся в памяти, подписки читаются потоком.
+    """
+    posts_by_author = {}
+    window_posts = Post.objects.filter(
+        pub_date__gte=since, pub_date__lt=until
+    ).select_related('author', 'group').order_by('pub_date')
+    for post in window_posts:
+        posts_by_author.setdefault(post.author_id, []).append(post)
+    if not posts_by_author:
+        return
+    follows = Follow.objects.filter(
+        author_id__in=posts_by_author
+    ).exclude(user__email='').select_related('user').order_by('user_id')
+    rows = follows.iterator(chunk_size=settings.DIGEST_BATCH_SIZE)
+    for _, user_follows in groupby(rows, key=lambda follow: follow.user_id):
+        user_follows = list(user_follows)
+        posts = []
+        for follow in user_follows:
+            posts.extend(posts_by_author[follow.author_id])
+        posts.sort(key=lambda post: post.pub_date)
+        yield user_follows[0].user, posts
+
+
+def render_digest(user, posts, domain):
+    body = render_to_string(DIGEST_TEMPLATE, {'user': user,
+                                              'posts': posts,
+                                              'domain': domain,
+                                              'protocol': 'https'})
+    return EmailMessage(DIGEST_SUBJECT, body, to=[user.email])
+
+
+def send_digests(since, until, connection=None):
+    """
+    Рассылает дайджесты пачками через одно соединение с почтовым бэкендом.
+    Возвращает число отправленных писем.
+    """
+    domain = Site.objects.get_current().domain
+    connection = connection or get_connection()
+    sent = 0
+    batch = []
+    connection.open()
+    try:
+        for user, posts in collect_digests(since, until):
+            batch.append(render_digest(user, posts, domain))
+            if len(batch) >= settings.DIGEST_BATCH_SIZE:
+                sent += connection.send_messages(batch) or 0
+                batch = []
+                time.sleep(settings.DIGEST_THROTTLE)
+        if batch:
+            sent += connection.send_messages(batch) or 0
+    finally:
+        connection.close()
+    return sent
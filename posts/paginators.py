@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# дальше этого числа строк отфильтрованные выборки не досчитываются
+EXACT_COUNT_LIMIT = 10000
+# сколько соседних страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 2
+
+
+def table_count_key(model):
+    return f'table_count:{model._meta.db_table}'
+
+
+def estimate_table_count(model):
+    """
+    Число строк таблицы: в PostgreSQL оценка планировщика без COUNT(*),
+    в остальных базах COUNT(*), закэшированный на TABLE_COUNT_TIMEOUT.
+    """
+    connection = connections[model.objects.db]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           [table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    # MAX(pk) завышает число после удалений и архивации, поэтому точный
+    # COUNT(*), но не чаще раза в TABLE_COUNT_TIMEOUT
+    return cache.get_or_set(table_count_key(model), model.objects.count,
+                            settings.TABLE_COUNT_TIMEOUT)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: без фильтров число строк оценивается,
+    с фильтрами считается не дальше EXACT_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return estimate_table_count(queryset.model)
+        return queryset.order_by()[:EXACT_COUNT_LIMIT].count()
+
+
+def feed_count_key(feed):
+    return f'feed_count:{feed}'
+
+
+class FeedPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    @property
+    def last_number(self):
+        # кэшированное число может отставать от настоящего
+        return max(self.paginator.num_pages,
+                   self.number + 1 if self._has_next else self.number)
+
+    @property
+    def window(self):
+        """
+        Номера страниц вокруг текущей плюс первая и последняя,
+        None на месте пропуска: [1, None, 6, 7, 8, 9, 10, None, 40].
+        """
+        last = self.last_number
+        start = max(self.number - PAGE_WINDOW, 1)
+        stop = min(self.number + PAGE_WINDOW, last)
+        numbers = list(range(start, stop + 1))
+        if start > 2:
+            numbers.insert(0, None)
+        if start > 1:
+            numbers.insert(0, 1)
+        if stop < last - 1:
+            numbers.append(None)
+        if stop < last:
+            numbers.append(last)
+        return numbers
+
+
+class FeedPaginator(Paginator):
+    """
+    Пагинатор ленты: приблизительное число постов берется из кэша и
+    пересчитывается только раз в FEED_COUNT_TIMEOUT секунд, запись поста
+    его не сбрасывает. Без фильтров число оценивается, как в
+    EstimatedCountPaginator, с фильтрами считается не дальше
+    EXACT_COUNT_LIMIT. Страница выбирается по смещению, а не по числу,
+    поэтому устаревшее число не обрезает ленту; есть ли следующая
+    страница, выясняется выборкой на один пост больше.
+    """
+
+    def __init__(self, object_list, per_page, feed=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+
+    @cached_property
+    def count(self):
+        if self.feed is None:
+            return super().count
+        key = feed_count_key(self.feed)
+        count = cache.get(key)
+        if count is None:
+            queryset = self.object_list
+            query = getattr(queryset, 'query', None)
+            if query is None:
+                # не QuerySet, например лента профиля вместе с архивом
+                count = super().count
+            elif not query.where:
+                count = estimate_table_count(queryset.model)
+            else:
+                count = queryset.order_by()[:EXACT_COUNT_LIMIT].count()
+            cache.set(key, count, settings.FEED_COUNT_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage('That page contains no results')
+        has_next = len(object_list) > self.per_page
+        return FeedPage(object_list[:self.per_page], number, self, has_next)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            pass
+        # кэшированное или оценочное число больше настоящего: считаем
+        # точно, в обход обоих кэшей, и запоминаем результат для ленты
+        self.__dict__.pop('num_pages', None)
+        self.count = super().count
+        if self.feed is not None:
+            cache.set(feed_count_key(self.feed), self.count,
+                      settings.FEED_COUNT_TIMEOUT)
+            model = getattr(self.object_list, 'model', None)
+            if model is not None:
+                cache.delete(table_count_key(model))
+        try:
+            return self.page(self.num_pages)
+        except EmptyPage:
+            # посты удалили между подсчетом и выборкой
+            return self.page(1)
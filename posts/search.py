@@ -0,0 +1,73 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+# таблицы, для которых поддерживается полнотекстовый индекс SQLite FTS5:
+# таблица -> индексируемая колонка
+FULLTEXT_TABLES = {
+    'posts_post': 'text',
+    'posts_comment': 'text',
+}
+
+FTS_SCHEMA = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5('
+    '{column}, content=\'{table}\', content_rowid=\'id\')',
+    'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END',
+    'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN '
+    'INSERT INTO {fts}({fts}, rowid, {column}) '
+    'VALUES (\'delete\', old.id, old.{column}); END',
+    'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} '
+    'ON {table} BEGIN '
+    'INSERT INTO {fts}({fts}, rowid, {column}) '
+    'VALUES (\'delete\', old.id, old.{column}); '
+    'INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END',
+]
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def is_fulltext_available(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_fulltext_index(using='default', **kwargs):
+    """
+    Создает FTS5-таблицы и триггеры. SQLite пересоздает таблицу при
+    изменении схемы и теряет триггеры, поэтому вызывается после каждой
+    миграции; индекс перестраивается, если триггеров не было.
+    """
+    if not is_fulltext_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        for table, column in FULLTEXT_TABLES.items():
+            fts = fts_table(table)
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master "
+                "WHERE type = 'trigger' AND tbl_name = %s AND name LIKE %s",
+                [table, f'{fts}_a_'])
+            triggers, = cursor.fetchone()
+            for statement in FTS_SCHEMA:
+                cursor.execute(statement.format(fts=fts, table=table,
+                                                column=column))
+            if triggers < len(FTS_SCHEMA) - 1:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def build_match_query(search_term):
+    """
+    Превращает строку поиска в запрос FTS5: все слова обязательны,
+    каждое ищется как префикс.
+    """
+    words = search_term.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""'))
+                    for word in words)
+
+
+def fulltext_filter(queryset, search_term):
+    table = queryset.model._meta.db_table
+    fts = fts_table(table)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s',
+        (build_match_query(search_term),)))
@@ -0,0 +1,38 @@
+from django.contrib.flatpages.models import FlatPage
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import flatpages
+from .lookups import OBJECT_CACHES
+from .models import Group, User
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def invalidate_renamed(sender, instance, update_fields=None, **kwargs):
+    object_cache = OBJECT_CACHES[sender]
+    if instance.pk is None:
+        return
+    if update_fields is not None and object_cache.field not in update_fields:
+        return
+    old_value = sender.objects.filter(pk=instance.pk).values_list(
+        object_cache.field, flat=True).first()
+    if old_value is not None:
+        object_cache.invalidate(old_value)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def invalidate_object(sender, instance, **kwargs):
+    object_cache = OBJECT_CACHES[sender]
+    object_cache.invalidate(getattr(instance, object_cache.field))
+
+
+@receiver(post_save, sender=FlatPage)
+@receiver(post_delete, sender=FlatPage)
+@receiver(m2m_changed, sender=FlatPage.sites.through)
+def invalidate_flatpages(**kwargs):
+    flatpages.invalidate()
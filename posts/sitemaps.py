@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.html import escape
+
+from .models import ArchivedPost, Group, Post, User
+
+SITEMAP_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<urlset xmlns="http://www.sitemaps.org/schemas/'
+                  'sitemap/0.9">\n')
+SITEMAP_FOOTER = '</urlset>\n'
+INDEX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/'
+                'sitemap/0.9">\n')
+INDEX_FOOTER = '</sitemapindex>\n'
+CONTENT_TYPE = 'application/xml'
+CHUNK_SIZE = 2000
+
+
+def post_urls(queryset):
+    rows = queryset.values_list('id', 'author__username', 'pub_date')
+    for post_id, username, pub_date in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield reverse('post', args=[username, post_id]), pub_date
+
+
+def profile_urls(queryset):
+    rows = queryset.filter(is_active=True).annotate(
+        lastmod=Max('posts__pub_date')).values_list('username', 'lastmod')
+    for username, lastmod in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield reverse('profile', args=[username]), lastmod
+
+
+def group_urls(queryset):
+    rows = queryset.annotate(
+        lastmod=Max('posts__pub_date')).values_list('slug', 'lastmod')
+    for slug, lastmod in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield reverse('group', args=[slug]), lastmod
+
+
+# раздел -> (модель, функция, отдающая пары (адрес, дата изменения))
+SECTIONS = {
+    'posts': (Post, post_urls),
+    'archive': (ArchivedPost, post_urls),
+    'profiles': (User, profile_urls),
+    'groups': (Group, group_urls),
+}
+
+
+def get_shard_count(model):
+    """
+    Шард — это диапазон первичных ключей длиной SITEMAP_SHARD_SIZE, поэтому
+    в шарде не больше адресов, чем разрешено, и выборка идет по индексу,
+    без OFFSET.
+    """
+    max_pk = model.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    return -(-max_pk // settings.SITEMAP_SHARD_SIZE)
+
+
+def format_lastmod(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def render_url(base, path, lastmod):
+    entry = f'<url><loc>{escape(base + path)}</loc>'
+    if lastmod is not None:
+        entry += f'<lastmod>{format_lastmod(lastmod)}</lastmod>'
+    return entry + '</url>\n'
+
+
+def stream_and_cache(parts, key):
+    rendered = []
+    for part in parts:
+        rendered.append(part)
+        yield part
+    cache.set(key, ''.join(rendered), settings.SITEMAP_CACHE_TIMEOUT)
+
+
+def shard_parts(base, section, shard):
+    model, get_urls = SECTIONS[section]
+    low = shard * settings.SITEMAP_SHARD_SIZE
+    queryset = model.objects.filter(
+        pk__gt=low, pk__lte=low + settings.SITEMAP_SHARD_SIZE).order_by('pk')
+    yield SITEMAP_HEADER
+    for path, lastmod in get_urls(queryset):
+        yield render_url(base, path, lastmod)
+    yield SITEMAP_FOOTER
+
+
+def get_base_url(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def sitemap_index(request):
+    base = get_base_url(request)
+    parts = [INDEX_HEADER]
+    for section, (model, _) in SECTIONS.items():
+        for shard in range(get_shard_count(model)):
+            path = reverse('sitemap_section', args=[section, shard])
+            parts.append(f'<sitemap><loc>{escape(base + path)}</loc>'
+                         f'</sitemap>\n')
+    parts.append(INDEX_FOOTER)
+    return HttpResponse(''.join(parts), content_type=CONTENT_TYPE)
+
+
+def sitemap_section(request, section, shard):
+    if section not in SECTIONS:
+        raise Http404('Unknown sitemap section')
+    base = get_base_url(request)
+    key = f'sitemap:{base}:{section}:{shard}'
+    cached = cache.get(key)
+    if cached is not None:
+        return HttpResponse(cached, content_type=CONTENT_TYPE)
+    if shard >= get_shard_count(SECTIONS[section][0]):
+        raise Http404('Unknown sitemap shard')
+    parts = shard_parts(base, section, shard)
+    return StreamingHttpResponse(stream_and_cache(parts, key),
+                                 content_type=CONTENT_TYPE)
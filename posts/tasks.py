@@ -0,0 +1,33 @@
+from django.utils.dateparse import parse_datetime
+from sorl.thumbnail import get_thumbnail
+
+from tasks.queue import task
+from . import deletion, notifications
+from .models import Post
+
+# должно совпадать с параметрами {% thumbnail %} в includes/post_block.html
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@task('posts.make_thumbnail')
+def make_thumbnail(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    get_thumbnail(post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+@task('posts.send_digests')
+def send_digests(since, until):
+    notifications.send_digests(parse_datetime(since), parse_datetime(until))
+
+
+@task('posts.purge_user')
+def purge_user(user_id):
+    deletion.purge_user(user_id)
+
+
+@task('posts.delete_media')
+def delete_media(names):
+    deletion.delete_media(names)
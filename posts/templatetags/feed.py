@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+POST_TEMPLATE = 'includes/post_block.html'
+
+
+@register.simple_tag(takes_context=True)
+def render_feed(context, posts, template_name=POST_TEMPLATE):
+    """
+    Рендерит все посты страницы за один проход: шаблон поста ищется
+    один раз, а контекст и состояние рендера общие для всей ленты,
+    вместо {% include %} с поиском шаблона и новым контекстом на каждый пост.
+    """
+    post_template = context.template.engine.get_template(template_name)
+    parts = []
+    with context.push(), context.render_context.push_state(post_template):
+        for post in posts:
+            context['post'] = post
+            # _render без повторной подготовки render_context для каждого
+            # поста, ее уже сделал push_state выше
+            parts.append(post_template._render(context))
+    return mark_safe(''.join(parts))
@@ -1,15 +1,64 @@
+import gzip
+import json
+import math
+import os
 import tempfile
+import threading
+import time
+from concurrent import futures
+from datetime import timedelta
+from io import StringIO
 
-from django.test import TestCase, Client, override_settings
+import brotli
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.models.signals import post_save
+from django.template import engines
+from django.test import (TestCase, TransactionTestCase, LiveServerTestCase,
+                         Client, override_settings)
 from django.urls import reverse
-from posts.models import User, Post, Group, Follow
-from django.core.cache import cache
+from django.utils import timezone
+from posts.models import (User, Post, Group, Follow, Comment, ArchivedPost,
+                          ArchivedComment)
+from posts.counters import ViewCounter, view_counter
+from posts.deletion import schedule_user_deletion
+from posts.management.commands.benchmark_feed import (INCLUDE_LOOP,
+                                                     RENDER_FEED, make_posts)
+from posts.loadtest import parse_mix, run_client
+from posts import flatpages
+from posts.lookups import groups_by_slug, users_by_username
+from posts.notifications import send_digests
+from posts.paginators import (EstimatedCountPaginator, FeedPaginator,
+                              feed_count_key, table_count_key)
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from tasks.models import Task
+from tasks.queue import run_pending
+from yatube import profiler, warmup
+from yatube.middleware import minify_html
+from yatube.queryaudit import AuditedClient, QueryAuditError, audit_queries
+from yatube.ratelimit import hit as ratelimit_hit, ratelimit
+from yatube.sqlite import write_queue
+from yatube.static import StaticFilesApplication
+
+
+def setUpModule():
+    # доля профилирования 0 без обращений к общему кэшу, иначе
+    # перечитывание доли добавляет запрос к случайному тесту
+    profiler._rate = (0, math.inf)
 
 
 class TestPosts(TestCase):
     def setUp(self):
-        self.unauth_client = Client()
-        self.auth_client = Client()
+        cache.clear()
+        self.unauth_client = AuditedClient()
+        self.auth_client = AuditedClient()
         self.user = User.objects.create_user(username='test_user')
         self.auth_client.force_login(self.user)
         self.group = Group.objects.create(title='test group', slug='test_group')
@@ -259,3 +308,1125 @@ class TestPosts(TestCase):
         self.assertNotContains(self.response,
                                'form id="adding_comment"',
                                msg_prefix=message)
+
+
+class TestQueryAudit(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = AuditedClient()
+        self.user = User.objects.create_user(username='audited')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.client.force_login(self.reader)
+        self.group = Group.objects.create(title='Audited', slug='audited')
+        for number in range(5):
+            post = Post.objects.create(text=f'Audited post {number}',
+                                       author=self.user, group=self.group)
+            Comment.objects.create(post=post, author=self.reader,
+                                   text=f'Comment {number}')
+        self.post = post
+
+    def test_feeds_within_budget(self):
+        urls = [reverse('index'),
+                reverse('group', args=[self.group.slug]),
+                reverse('follow_index'),
+                reverse('profile', args=[self.user.username]),
+                reverse('post', args=[self.user.username, self.post.id])]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                message = 'Feed should show comment counts'
+                self.assertContains(response, 'Комментариев: 1',
+                                    msg_prefix=message)
+
+    def test_detects_full_scan(self):
+        message = 'Filtering by an unindexed column should be reported'
+        with self.assertRaisesMessage(QueryAuditError, 'full scan',
+                                      msg=message):
+            with audit_queries():
+                list(Post.objects.filter(text='Audited post 1'))
+
+    def test_detects_repeated_queries(self):
+        message = 'Loading authors one by one should be reported as N+1'
+        with self.assertRaisesMessage(QueryAuditError, 'N+1', msg=message):
+            with audit_queries():
+                for post in Post.objects.all():
+                    post.author.username
+
+    def test_budget(self):
+        message = 'Exceeding the query budget should be reported'
+        with self.assertRaisesMessage(QueryAuditError, 'budget is 1',
+                                      msg=message):
+            with audit_queries(budget=1):
+                User.objects.count()
+                Group.objects.count()
+
+
+class TestFeedRendering(TestCase):
+    def test_same_output_as_include(self):
+        engine = engines['django']
+        context = {'page': make_posts(3), 'user': AnonymousUser()}
+        message = 'render_feed should render posts like the include loop'
+        self.assertHTMLEqual(engine.from_string(RENDER_FEED).render(context),
+                             engine.from_string(INCLUDE_LOOP).render(context),
+                             msg=message)
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_feed', '--sizes=10', '--repeat=1', stdout=out)
+        message = 'Benchmark should report a row per page size'
+        self.assertIn('      10', out.getvalue(), msg=message)
+
+
+class TestFeedPaginator(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='prolific')
+        Post.objects.bulk_create(
+            Post(text=f'Paged post {number}', author=self.user)
+            for number in range(25))
+
+    def test_window(self):
+        paginator = FeedPaginator(list(range(400)), 10)
+        message = 'Window should show neighbours, first and last pages'
+        self.assertEqual(paginator.page(15).window,
+                         [1, None, 13, 14, 15, 16, 17, None, 40], msg=message)
+        self.assertEqual(paginator.page(2).window, [1, 2, 3, 4, None, 40],
+                         msg=message)
+        self.assertEqual(paginator.page(40).window, [1, None, 38, 39, 40],
+                         msg=message)
+
+    def test_stale_count_does_not_truncate(self):
+        cache.set(feed_count_key('index'), 5)
+        paginator = FeedPaginator(Post.objects.all(), 10, feed='index')
+        page = paginator.get_page(2)
+        message = 'Stale low count should not cut the feed short'
+        self.assertEqual(len(page), 10, msg=message)
+        self.assertTrue(page.has_next(), msg=message)
+        self.assertEqual(page.window[-1], 3, msg=message)
+
+    def test_stale_count_beyond_end(self):
+        cache.set(feed_count_key('index'), 1000)
+        paginator = FeedPaginator(Post.objects.all(), 10, feed='index')
+        page = paginator.get_page(50)
+        message = 'Page past the end should fall back to the real last page'
+        self.assertEqual(page.number, 3, msg=message)
+        self.assertEqual(len(page), 5, msg=message)
+
+    def test_stale_table_count_beyond_end(self):
+        cache.set(table_count_key(Post), 1000)
+        response = self.client.get(reverse('index'), {'page': 50})
+        message = 'Stale table estimate should not break the last page'
+        self.assertEqual(response.status_code, 200, msg=message)
+        self.assertEqual(response.context['page'].number, 3, msg=message)
+        message = 'Exact count should replace the stale estimate'
+        self.assertEqual(cache.get(feed_count_key('index')), 25, msg=message)
+
+    def test_count_cached_until_timeout(self):
+        self.client.get(reverse('index'))
+        message = 'Feed count should be cached'
+        self.assertEqual(cache.get(feed_count_key('index')), 25, msg=message)
+        Post.objects.create(text='Fresh post', author=self.user)
+        message = 'New post should not reset the cached count'
+        self.assertEqual(cache.get(feed_count_key('index')), 25, msg=message)
+        response = self.client.get(reverse('index'), {'page': 3})
+        message = 'Post beyond the cached count should still be reachable'
+        self.assertEqual(len(response.context['page']), 6, msg=message)
+
+    def test_bounded_links(self):
+        Post.objects.bulk_create(
+            Post(text=f'More post {number}', author=self.user)
+            for number in range(200))
+        response = self.client.get(reverse('index'), {'page': 10})
+        message = 'Pagination should not link every page'
+        self.assertContains(response, '?page=23', msg_prefix=message)
+        self.assertContains(response, '?page=12', msg_prefix=message)
+        self.assertNotContains(response, '?page=5"', msg_prefix=message)
+
+
+class TestDigests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.other_author = User.objects.create_user(username='other_author')
+        self.follower = User.objects.create_user(username='follower',
+                                                 email='follower@yatube.ru')
+        self.silent = User.objects.create_user(username='silent')
+        for user in (self.follower, self.silent):
+            Follow.objects.create(user=user, author=self.author)
+            Follow.objects.create(user=user, author=self.other_author)
+        Post.objects.create(text='First digest post', author=self.author)
+        Post.objects.create(text='Second digest post',
+                            author=self.other_author)
+        now = timezone.now()
+        self.window = (now - timedelta(hours=1), now + timedelta(hours=1))
+
+    def test_digest_aggregates_posts(self):
+        sent = send_digests(*self.window)
+        message = 'Follower should get exactly one digest with all posts'
+        self.assertEqual(sent, 1, msg=message)
+        self.assertEqual(len(mail.outbox), 1, msg=message)
+        digest, = mail.outbox
+        self.assertEqual(digest.to, [self.follower.email], msg=message)
+        self.assertIn('First digest post', digest.body, msg=message)
+        self.assertIn('Second digest post', digest.body, msg=message)
+
+    def test_digest_empty_window(self):
+        since = self.window[1]
+        sent = send_digests(since, since + timedelta(hours=1))
+        message = 'Digest should not be sent without new posts'
+        self.assertEqual(sent, 0, msg=message)
+
+    def test_digest_file_backend(self):
+        second = User.objects.create_user(username='second_follower',
+                                          email='second@yatube.ru')
+        Follow.objects.create(user=second, author=self.author)
+        with tempfile.TemporaryDirectory() as temp_directory:
+            with override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.'
+                                  'filebased.EmailBackend',
+                    EMAIL_FILE_PATH=temp_directory):
+                send_digests(*self.window)
+            files = os.listdir(temp_directory)
+            message = 'Digests should be written through one connection'
+            self.assertEqual(len(files), 1, msg=message)
+            with open(os.path.join(temp_directory, files[0])) as log:
+                content = log.read()
+        self.assertIn(self.follower.email, content, msg=message)
+        self.assertIn(second.email, content, msg=message)
+
+    def test_new_post_schedules_digest(self):
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('new_post'), {'text': 'Scheduled post'})
+        client.post(reverse('new_post'), {'text': 'Another post'})
+        message = 'New posts should share one scheduled digest task'
+        self.assertEqual(
+            Task.objects.filter(name='posts.send_digests').count(), 1,
+            msg=message)
+
+
+class TestAdmin(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin')
+        self.client.force_login(self.admin)
+        self.post = Post.objects.create(text='Searchable elephant story',
+                                        author=self.admin)
+        Post.objects.create(text='Unrelated text', author=self.admin)
+
+    def test_post_search_uses_fulltext_index(self):
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'eleph'})
+        message = 'Admin search should find post by word prefix'
+        self.assertContains(response, 'Searchable elephant story',
+                            msg_prefix=message)
+        self.assertNotContains(response, 'Unrelated text',
+                               msg_prefix=message)
+
+    def test_search_follows_edits(self):
+        self.post.text = 'Renamed giraffe story'
+        self.post.save()
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'giraffe'})
+        message = 'Fulltext index should follow post edits'
+        self.assertContains(response, 'Renamed giraffe story',
+                            msg_prefix=message)
+
+    def test_blank_search(self):
+        for term in (' ', '-'):
+            with self.subTest(term=term):
+                response = self.client.get(
+                    reverse('admin:posts_post_changelist'), {'q': term})
+                message = 'Search without words should not break changelist'
+                self.assertEqual(response.status_code, 200, msg=message)
+
+    def test_count_after_delete(self):
+        cache.clear()
+        Post.objects.create(text='Deleted post', author=self.admin).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        message = 'Deleted posts should not be counted'
+        self.assertEqual(paginator.count, 2, msg=message)
+
+    def test_comment_changelist(self):
+        Comment.objects.create(post=self.post, author=self.admin,
+                               text='Admin comment')
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'))
+        message = 'Comment changelist should be available'
+        self.assertContains(response, 'Admin comment', msg_prefix=message)
+
+
+class TestRateLimit(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches[settings.RATELIMIT_CACHE].clear()
+        self.user = User.objects.create_user(username='spammer')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(text='Some text', author=self.user)
+
+    @override_settings(RATELIMIT_POLICIES={'comment': '2/m'})
+    def test_comment_limit(self):
+        url = reverse('add_comment', args=[self.user.username, self.post.id])
+        for _ in range(2):
+            response = self.client.post(url, {'text': 'Spam'})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(url, {'text': 'Spam'})
+        message = 'Comments over the limit should be rejected'
+        self.assertEqual(response.status_code, 429, msg=message)
+        self.assertIn('Retry-After', response, msg=message)
+        self.assertEqual(self.post.comments.count(), 2, msg=message)
+
+    @override_settings(RATELIMIT_POLICIES={'signup': '1/h'})
+    def test_signup_limit(self):
+        client = Client()
+        client.get(reverse('signup'))
+        client.post(reverse('signup'), {'username': 'first'})
+        response = client.post(reverse('signup'), {'username': 'second'})
+        message = 'Signup attempts over the limit should be rejected'
+        self.assertEqual(response.status_code, 429, msg=message)
+
+    @override_settings(RATELIMIT_POLICIES={'comment': '1/m'})
+    def test_metrics(self):
+        url = reverse('add_comment', args=[self.user.username, self.post.id])
+        metrics_url = reverse('ratelimit_metrics')
+        message = 'Metrics should be available to staff only'
+        self.assertEqual(self.client.get(metrics_url).status_code, 302,
+                         msg=message)
+        self.user.is_staff = True
+        self.user.save()
+        before = self.client.get(metrics_url).json()['policies'].get(
+            'comment', {'allowed': 0, 'blocked': 0})
+        for _ in range(2):
+            self.client.post(url, {'text': 'Spam'})
+        after = self.client.get(metrics_url).json()['policies']['comment']
+        message = 'Metrics should count allowed and blocked requests'
+        self.assertEqual(after['allowed'] - before['allowed'], 1, msg=message)
+        self.assertEqual(after['blocked'] - before['blocked'], 1, msg=message)
+
+    @override_settings(RATELIMIT_POLICIES={'post': '1/m'})
+    def test_get_is_not_limited(self):
+        for _ in range(3):
+            response = self.client.get(reverse('new_post'))
+        message = 'Only writes should be limited on new post page'
+        self.assertEqual(response.status_code, 200, msg=message)
+
+    @override_settings(RATELIMIT_POLICIES={})
+    def test_missing_policy(self):
+        message = 'Unknown policy should fail when the view is decorated'
+        with self.assertRaises(ImproperlyConfigured, msg=message):
+            ratelimit('missing')
+        url = reverse('add_comment', args=[self.user.username, self.post.id])
+        response = self.client.post(url, {'text': 'Not limited'})
+        message = 'Policy removed from settings should not break the view'
+        self.assertEqual(response.status_code, 302, msg=message)
+
+    def test_blocked_hits_not_counted(self):
+        now = time.time()
+        for _ in range(5):
+            ratelimit_hit('rl:test', 1, 60, now)
+        key = f'rl:test:{int(now // 60)}'
+        message = 'Rejected requests should not extend the block'
+        self.assertEqual(caches[settings.RATELIMIT_CACHE].get(key), 1,
+                         msg=message)
+
+
+class TestViewCounter(TestCase):
+    def setUp(self):
+        # просмотры из других тестов не должны попасть в новые посты
+        view_counter.flush()
+        self.user = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(text='Popular post', author=self.user)
+
+    def test_flush_writes_batch(self):
+        counter = ViewCounter()
+        other = Post.objects.create(text='Other post', author=self.user)
+        for post_id in (self.post.id, self.post.id, other.id):
+            counter.record(post_id)
+        message = 'Flush should update every viewed post'
+        self.assertEqual(counter.flush(), 2, msg=message)
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.post.views, other.views), (2, 1), msg=message)
+        message = 'Second flush should have nothing to write'
+        self.assertEqual(counter.flush(), 0, msg=message)
+
+    def test_not_started_outside_server(self):
+        counter = ViewCounter()
+        counter.record(self.post.id)
+        message = 'Counter should not write in the background unless started'
+        self.assertIsNone(counter._pid, msg=message)
+        self.assertEqual(counter.pending(self.post.id), 1, msg=message)
+
+    def test_post_view_does_not_write(self):
+        url = reverse('post', args=[self.user.username, self.post.id])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.post.refresh_from_db()
+        message = 'Post page should not write view counter synchronously'
+        self.assertEqual(self.post.views, 0, msg=message)
+        message = 'Post page should show buffered views'
+        self.assertContains(response, 'Просмотров: 2', msg_prefix=message)
+        view_counter.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 2, msg=message)
+
+
+class TestObjectCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached_user')
+        self.group = Group.objects.create(title='Cached group',
+                                          slug='cached_group')
+
+    def test_cached_lookup(self):
+        users_by_username.get(self.user.username)
+        groups_by_slug.get(self.group.slug)
+        message = 'Repeated lookups should not query database'
+        with self.assertNumQueries(0, msg=message):
+            self.assertEqual(users_by_username.get(self.user.username),
+                             self.user)
+            self.assertEqual(groups_by_slug.get(self.group.slug), self.group)
+
+    def test_no_secrets_cached(self):
+        users_by_username.get(self.user.username)
+        cached = cache.get(users_by_username.make_key(self.user.username))
+        message = 'Password hash should not be stored in cache'
+        self.assertNotIn(self.user.password, cached, msg=message)
+        message = 'Other fields should still load on access'
+        self.assertTrue(users_by_username.get(self.user.username).is_active,
+                        msg=message)
+
+    def test_missing_lookup(self):
+        with self.assertRaises(User.DoesNotExist):
+            users_by_username.get('newcomer')
+        message = 'Missing object should be cached too'
+        with self.assertNumQueries(0, msg=message):
+            with self.assertRaises(User.DoesNotExist):
+                users_by_username.get('newcomer')
+        User.objects.create_user(username='newcomer')
+        message = 'Created object should replace cached miss'
+        self.assertEqual(users_by_username.get('newcomer').username,
+                         'newcomer', msg=message)
+
+    def test_invalidation(self):
+        users_by_username.get(self.user.username)
+        self.user.username = 'renamed_user'
+        self.user.save()
+        message = 'Renamed user should not be found by old name'
+        with self.assertRaises(User.DoesNotExist, msg=message):
+            users_by_username.get('cached_user')
+        groups_by_slug.get(self.group.slug)
+        self.group.delete()
+        message = 'Deleted group should not stay in cache'
+        response = self.client.get(reverse('group', args=['cached_group']))
+        self.assertEqual(response.status_code, 404, msg=message)
+
+
+@override_settings(USER_PURGE_BATCH_SIZE=2)
+class TestUserDeletion(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='prolific')
+        self.reader = User.objects.create_user(username='reader')
+        for number in range(5):
+            post = Post.objects.create(text=f'Post {number}',
+                                       author=self.user)
+            Comment.objects.create(post=post, author=self.reader,
+                                   text='Reader comment')
+        self.reader_post = Post.objects.create(text='Reader post',
+                                               author=self.reader)
+        Comment.objects.create(post=self.reader_post, author=self.user,
+                               text='Prolific comment')
+        Follow.objects.create(user=self.user, author=self.reader)
+        Follow.objects.create(user=self.reader, author=self.user)
+
+    def test_account_disabled_immediately(self):
+        schedule_user_deletion(self.user)
+        self.user.refresh_from_db()
+        message = 'Account should be disabled before data is removed'
+        self.assertFalse(self.user.is_active, msg=message)
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 5,
+                         msg=message)
+
+    def test_purge_removes_content(self):
+        schedule_user_deletion(self.user)
+        run_pending()
+        message = 'Purge should remove user and all related rows'
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists(),
+                         msg=message)
+        self.assertEqual(list(Post.objects.all()), [self.reader_post],
+                         msg=message)
+        self.assertFalse(Comment.objects.exists(), msg=message)
+        self.assertFalse(Follow.objects.exists(), msg=message)
+
+    def test_reactivated_user_is_kept(self):
+        schedule_user_deletion(self.user)
+        self.user.is_active = True
+        self.user.save()
+        run_pending()
+        message = 'Reactivated user should not be purged'
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists(),
+                        msg=message)
+
+    def test_schedule_again_after_reactivation(self):
+        schedule_user_deletion(self.user)
+        self.user.is_active = True
+        self.user.save()
+        run_pending()
+        schedule_user_deletion(self.user)
+        message = 'Second deletion request should run a new purge'
+        self.assertEqual(run_pending(), 1, msg=message)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists(),
+                         msg=message)
+
+    def test_repeated_request_is_deduplicated(self):
+        first = schedule_user_deletion(self.user)
+        message = 'Pending purge should be reused'
+        self.assertEqual(schedule_user_deletion(self.user), first,
+                         msg=message)
+
+
+class TestMediaGarbage(TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.media_root = self.temp_directory.name
+        self.user = User.objects.create_user(username='photographer')
+        Post.objects.create(text='With image', author=self.user,
+                            image='posts/used.png')
+        self.files = ['posts/used.png', 'posts/orphan.png',
+                      'cache/ab/cd/orphan.jpg']
+        for name in self.files:
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as image:
+                image.write(b'image')
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def existing_files(self):
+        return [name for name in self.files
+                if os.path.exists(os.path.join(self.media_root, name))]
+
+    def collect(self, *args):
+        out = StringIO()
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command('collect_media_garbage', '--min-age=0', *args,
+                         stdout=out)
+        return out.getvalue()
+
+    def test_dry_run(self):
+        output = self.collect('--dry-run')
+        message = 'Dry run should report orphans without deleting them'
+        self.assertIn('лишних: 2', output, msg=message)
+        self.assertEqual(self.existing_files(), self.files, msg=message)
+
+    def test_lookup_uses_index(self):
+        # audit_queries поднимет QueryAuditError на полном обходе таблиц
+        with audit_queries(label='for collect_media_garbage'):
+            self.collect('--dry-run')
+
+    def test_orphans_removed(self):
+        self.collect('--chunk-size=1')
+        message = 'Only files without references should be deleted'
+        self.assertEqual(self.existing_files(), ['posts/used.png'],
+                         msg=message)
+
+
+class TestArchive(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='veteran')
+        self.old_posts = []
+        for number in range(12):
+            post = Post.objects.create(text=f'Old post {number}',
+                                       author=self.user)
+            self.old_posts.append(post)
+        Comment.objects.create(post=self.old_posts[0], author=self.user,
+                               text='Old comment')
+        Post.objects.filter(pk__in=[post.pk for post in self.old_posts]
+                            ).update(pub_date=timezone.now()
+                                     - timedelta(days=400))
+        self.fresh_post = Post.objects.create(text='Fresh post',
+                                              author=self.user)
+
+    def archive(self):
+        call_command('archive_posts', '--days=365', '--batch-size=5',
+                     '--pause=0', stdout=StringIO())
+
+    def test_old_posts_moved(self):
+        self.archive()
+        message = 'Old posts should leave hot table'
+        self.assertEqual(list(Post.objects.all()), [self.fresh_post],
+                         msg=message)
+        message = 'Old posts and comments should be in archive'
+        self.assertEqual(ArchivedPost.objects.count(), 12, msg=message)
+        self.assertEqual(ArchivedComment.objects.get().post_id,
+                         self.old_posts[0].pk, msg=message)
+
+    def test_archived_post_view(self):
+        self.archive()
+        post = self.old_posts[0]
+        response = self.client.get(
+            reverse('post', args=[self.user.username, post.pk]))
+        message = 'Archived post should be shown on post page'
+        self.assertContains(response, post.text, msg_prefix=message)
+        self.assertContains(response, 'Old comment', msg_prefix=message)
+
+    def test_profile_pages_include_archive(self):
+        self.archive()
+        url = reverse('profile', args=[self.user.username])
+        response = self.client.get(url)
+        message = 'Profile should start with hot posts'
+        self.assertContains(response, 'Fresh post', msg_prefix=message)
+        self.assertContains(response, 'Записей: 13', msg_prefix=message)
+        response = self.client.get(url, {'page': 2})
+        message = 'Profile should continue with archived posts'
+        self.assertContains(response, 'Old post', count=3,
+                            msg_prefix=message)
+
+
+class TestWarmCache(LiveServerTestCase):
+    # страницы запрашиваются у настоящего сервера в другом потоке
+    def test_warm_cache(self):
+        user = User.objects.create_user(username='popular')
+        group = Group.objects.create(title='Warm group', slug='warm_group')
+        Post.objects.create(text='Warm post', author=user, group=group)
+        out = StringIO()
+        call_command('warm_cache', '--pages=2', '--concurrency=2',
+                     f'--url={self.live_server_url}', stdout=out)
+        message = 'Index, group and profile pages should be requested'
+        self.assertIn('Страниц: 6, миниатюр: 0, ошибок: 0', out.getvalue(),
+                      msg=message)
+
+    def test_thumbnails_only_without_url(self):
+        User.objects.create_user(username='popular')
+        out = StringIO()
+        call_command('warm_cache', stdout=out)
+        message = 'Pages should not be rendered without a server URL'
+        self.assertIn('Страниц: 0', out.getvalue(), msg=message)
+
+    def test_budget(self):
+        out = StringIO()
+        call_command('warm_cache', '--budget=0', stdout=out)
+        message = 'Nothing should run when budget is exhausted'
+        self.assertIn('Страниц: 0', out.getvalue(), msg=message)
+
+
+@override_settings(RATELIMIT_ENABLED=False)
+class TestLoadTest(LiveServerTestCase):
+    def tearDown(self):
+        # просмотры, накопленные сервером, пишутся пока тестовая база жива
+        view_counter.flush()
+
+    def test_client_mix(self):
+        user = User.objects.create_user(username='loaded')
+        post = Post.objects.create(text='Loaded post', author=user)
+        self.client.force_login(user)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        host, port = self.server_thread.host, self.server_thread.port
+        results = run_client({
+            'host': host, 'port': port, 'session': session,
+            'targets': {'posts': [('loaded', post.id)],
+                        'authors': ['loaded']},
+            'mix': parse_mix('post=1,comment=1,new_post=1'), 'seed': 0,
+            'started': time.time(), 'duration': 1,
+        })
+        message = 'Every replayed request should succeed'
+        self.assertTrue(results, msg=message)
+        self.assertTrue(all(ok for *_, ok in results), msg=message)
+        message = 'Writes should reach the database'
+        self.assertTrue(Comment.objects.filter(post=post).exists(),
+                        msg=message)
+
+
+@override_settings(WRITE_QUEUE_ENABLED=True)
+class TestWriteQueue(TransactionTestCase):
+    # записи выполняет отдельный поток, ему нужны закоммиченные данные
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(text='Queued post', author=self.user)
+
+    def test_concurrent_writes(self):
+        def write(number):
+            write_queue.submit(Comment.objects.create, post=self.post,
+                               author=self.user, text=f'Queued {number}')
+
+        threads = [threading.Thread(target=write, args=(number,))
+                   for number in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        message = 'Every queued write should be committed'
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 10,
+                         msg=message)
+
+    def test_failure_is_isolated(self):
+        message = 'Failed write should raise in the submitting request'
+        with self.assertRaises(IntegrityError, msg=message):
+            write_queue.submit(Group.objects.create, title='Dup', slug='dup')
+            write_queue.submit(Group.objects.create, title='Dup', slug='dup')
+        write_queue.submit(Group.objects.create, title='Next', slug='next')
+        message = 'Writes after a failed one should still be committed'
+        self.assertTrue(Group.objects.filter(slug='next').exists(),
+                        msg=message)
+
+    def test_nested_submit(self):
+        def create_groups():
+            Group.objects.create(title='Outer', slug='outer')
+            write_queue.submit(Group.objects.create, title='Inner',
+                               slug='inner')
+
+        with self.settings(WRITE_QUEUE_TIMEOUT=5):
+            write_queue.submit(create_groups)
+        message = 'Submit from the writer thread should run inline'
+        self.assertEqual(Group.objects.filter(
+            slug__in=['outer', 'inner']).count(), 2, msg=message)
+
+    def test_timed_out_write_is_skipped(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        blocker = threading.Thread(target=write_queue.submit, args=(block,))
+        blocker.start()
+        started.wait(5)
+        message = 'Write that did not start in time should raise'
+        with self.settings(WRITE_QUEUE_TIMEOUT=0.1):
+            with self.assertRaises(futures.TimeoutError, msg=message):
+                write_queue.submit(Group.objects.create, title='Late',
+                                   slug='late')
+        release.set()
+        blocker.join()
+        write_queue.submit(Group.objects.create, title='Next', slug='next')
+        message = 'Timed out write should not be executed later'
+        self.assertFalse(Group.objects.filter(slug='late').exists(),
+                         msg=message)
+
+    def test_dead_writer_restarted(self):
+        def stop_thread():
+            raise SystemExit
+
+        message = 'Job that stops the writer should fail in the caller'
+        with self.assertRaises(SystemExit, msg=message):
+            write_queue.submit(stop_thread)
+        write_queue._thread.join(5)
+        with self.settings(WRITE_QUEUE_TIMEOUT=5):
+            write_queue.submit(Group.objects.create, title='After',
+                               slug='after')
+        message = 'Dead writer thread should be restarted'
+        self.assertTrue(Group.objects.filter(slug='after').exists(),
+                        msg=message)
+
+    def test_view_uses_queue(self):
+        threads = []
+
+        def record_thread(**kwargs):
+            threads.append(threading.current_thread().name)
+
+        post_save.connect(record_thread, sender=Comment)
+        post_save.connect(record_thread, sender=Post)
+        self.addCleanup(post_save.disconnect, record_thread, sender=Comment)
+        self.addCleanup(post_save.disconnect, record_thread, sender=Post)
+        self.client.force_login(self.user)
+        self.client.post(reverse('add_comment',
+                                 args=[self.user.username, self.post.id]),
+                         {'text': 'Queued from view'})
+        self.client.post(reverse('post_edit',
+                                 args=[self.user.username, self.post.id]),
+                         {'text': 'Edited in queue'})
+        message = 'Writes from views should run on the writer thread'
+        self.assertEqual(threads, ['sqlite-writer', 'sqlite-writer'],
+                         msg=message)
+        self.assertTrue(Comment.objects.filter(text='Queued from view')
+                        .exists(), msg=message)
+
+
+class TestSQLitePragmas(TestCase):
+    @override_settings(SQLITE_PRODUCTION=True)
+    def test_pragmas_applied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(connection.settings_dict,
+                                 NAME=os.path.join(directory, 'db.sqlite3'))
+            wrapper = DatabaseWrapper(settings_dict, alias='pragmas')
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode, = cursor.fetchone()
+                cursor.execute('PRAGMA busy_timeout')
+                busy_timeout, = cursor.fetchone()
+            wrapper.close()
+        message = 'Production mode should switch SQLite to WAL'
+        self.assertEqual(journal_mode, 'wal', msg=message)
+        self.assertEqual(busy_timeout, settings.SQLITE_PRAGMAS['busy_timeout'],
+                         msg=message)
+
+
+class TestReadiness(TestCase):
+    def test_ready_after_warmup(self):
+        warmup.run()
+        response = self.client.get(reverse('healthz_ready'))
+        message = 'Warmed up process should report readiness'
+        self.assertEqual(response.status_code, 200, msg=message)
+        self.assertEqual(set(response.json()['timings']),
+                         {name for name, _ in warmup.STAGES}, msg=message)
+
+
+class TestSitemaps(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='mapped')
+        self.group = Group.objects.create(title='Mapped', slug='mapped')
+        self.posts = [Post.objects.create(text=f'Post {number}',
+                                          author=self.user,
+                                          group=self.group)
+                      for number in range(3)]
+
+    def get_content(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    @override_settings(SITEMAP_SHARD_SIZE=2)
+    def test_index_lists_shards(self):
+        response = self.client.get(reverse('sitemap_index'))
+        content = self.get_content(response)
+        message = 'Sitemap index should list every post shard'
+        max_pk = self.posts[-1].pk
+        for shard in range(-(-max_pk // 2)):
+            self.assertIn(reverse('sitemap_section', args=['posts', shard]),
+                          content, msg=message)
+
+    def test_post_shard(self):
+        post = self.posts[0]
+        url = reverse('sitemap_section', args=['posts', 0])
+        content = self.get_content(self.client.get(url))
+        message = 'Post sitemap should contain post url with lastmod'
+        self.assertIn(reverse('post', args=[self.user.username, post.pk]),
+                      content, msg=message)
+        self.assertIn(f'<lastmod>{post.pub_date:%Y-%m-%d}', content,
+                      msg=message)
+        message = 'Repeated request should be served from cache'
+        with self.assertNumQueries(0, msg=message):
+            cached = self.get_content(self.client.get(url))
+        self.assertEqual(cached, content, msg=message)
+
+    def test_profiles_and_groups(self):
+        for section, path in (('profiles', reverse('profile',
+                                                   args=['mapped'])),
+                              ('groups', reverse('group', args=['mapped']))):
+            url = reverse('sitemap_section', args=[section, 0])
+            content = self.get_content(self.client.get(url))
+            self.assertIn(path, content,
+                          msg=f'Sitemap {section} should contain {path}')
+
+    def test_unknown_shard(self):
+        url = reverse('sitemap_section', args=['posts', 100])
+        message = 'Shard beyond last post should not exist'
+        self.assertEqual(self.client.get(url).status_code, 404, msg=message)
+
+
+class TestFlatpages(TestCase):
+    def setUp(self):
+        cache.clear()
+        flatpages._version = (None, 0)
+        self.page = FlatPage.objects.create(url='/about-author/',
+                                            title='Об авторе',
+                                            content='Author biography')
+        self.page.sites.add(Site.objects.get_current())
+        self.url = reverse('about_author')
+
+    def test_cached_render(self):
+        response = self.client.get(self.url)
+        message = 'Flatpage should be rendered'
+        self.assertContains(response, 'Author biography', msg_prefix=message)
+        message = 'Cached flatpage should not query database'
+        with self.assertNumQueries(0, msg=message):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Author biography', msg_prefix=message)
+
+    def test_etag_and_gzip(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        message = 'Matching ETag should return 304'
+        self.assertEqual(response.status_code, 304, msg=message)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        message = 'Precompressed page should be served to gzip clients'
+        self.assertEqual(response['Content-Encoding'], 'gzip', msg=message)
+        self.assertIn(b'Author biography', gzip.decompress(response.content),
+                      msg=message)
+        message = 'Gzip variant should have its own ETag'
+        self.assertNotEqual(response['ETag'], etag, msg=message)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        message = 'Plain ETag should not validate the gzip variant'
+        self.assertEqual(response.status_code, 200, msg=message)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        message = 'Gzip ETag should validate the gzip variant'
+        self.assertEqual(response.status_code, 304, msg=message)
+        response = self.client.get(self.url,
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        message = 'Client refusing gzip should get plain page'
+        self.assertFalse(response.has_header('Content-Encoding'), msg=message)
+        self.assertContains(response, 'Author biography', msg_prefix=message)
+
+    def test_invalidated_on_save(self):
+        self.client.get(self.url)
+        self.page.content = 'Updated biography'
+        self.page.save()
+        response = self.client.get(self.url)
+        message = 'Saved flatpage should replace cached one'
+        self.assertContains(response, 'Updated biography', msg_prefix=message)
+
+    def test_invalidated_by_other_process(self):
+        self.client.get(self.url)
+        # другой воркер правит страницу: меняется только общая версия
+        FlatPage.objects.filter(pk=self.page.pk).update(
+            content='Updated biography')
+        caches['shared'].incr(flatpages.VERSION_KEY)
+        message = 'Process should keep its version for a few seconds'
+        self.assertContains(self.client.get(self.url), 'Author biography',
+                            msg_prefix=message)
+        flatpages._version = (flatpages._version[0], 0)
+        message = 'Page should be rendered again after version check'
+        self.assertContains(self.client.get(self.url), 'Updated biography',
+                            msg_prefix=message)
+
+
+class TestStaticPipeline(TestCase):
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp_directory.name, 'source')
+        self.root = os.path.join(self.temp_directory.name, 'static')
+        os.makedirs(os.path.join(self.source, 'css'))
+        with open(os.path.join(self.source, 'css', 'site.css'), 'w') as css:
+            css.write('body { margin: 0; }\n' * 100)
+        self.settings = override_settings(
+            STATICFILES_STORAGE='yatube.storage.'
+                                'CompressedManifestStaticFilesStorage',
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATIC_ROOT=self.root)
+        self.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.temp_directory.cleanup()
+
+    def hashed_name(self):
+        with open(os.path.join(self.root, 'staticfiles.json')) as manifest:
+            return json.load(manifest)['paths']['css/site.css']
+
+    def request(self, path, **environ):
+        app = StaticFilesApplication(
+            lambda environ, start_response: [b'django'])
+        result = {}
+
+        def start_response(status, headers):
+            result['status'] = status
+            result['headers'] = dict(headers)
+
+        environ = dict({'REQUEST_METHOD': 'GET', 'PATH_INFO': path},
+                       **environ)
+        body = b''.join(app(environ, start_response))
+        return result.get('status'), result.get('headers', {}), body
+
+    def test_collectstatic_compresses(self):
+        hashed = self.hashed_name()
+        message = 'Collected files should get gzip and brotli siblings'
+        for suffix in ('.gz', '.br'):
+            self.assertTrue(os.path.exists(os.path.join(self.root,
+                                                        hashed + suffix)),
+                            msg=message)
+
+    def test_wsgi_serves_hashed_file(self):
+        path = settings.STATIC_URL + self.hashed_name()
+        status, headers, body = self.request(path,
+                                             HTTP_ACCEPT_ENCODING='gzip')
+        message = 'Hashed file should be served precompressed and immutable'
+        self.assertEqual(status, '200 OK', msg=message)
+        self.assertIn('immutable', headers['Cache-Control'], msg=message)
+        self.assertEqual(headers['Content-Encoding'], 'gzip', msg=message)
+        self.assertIn(b'margin', gzip.decompress(body), msg=message)
+        status, _, _ = self.request(path, HTTP_IF_NONE_MATCH=headers['ETag'],
+                                    HTTP_ACCEPT_ENCODING='gzip')
+        message = 'Matching ETag should return 304'
+        self.assertEqual(status, '304 Not Modified', msg=message)
+        status, identity_headers, _ = self.request(
+            path, HTTP_IF_NONE_MATCH=headers['ETag'])
+        message = 'Plain and gzip variants should have different ETags'
+        self.assertEqual(status, '200 OK', msg=message)
+        self.assertNotEqual(identity_headers['ETag'], headers['ETag'],
+                            msg=message)
+
+    def test_wsgi_serves_non_ascii_name(self):
+        media_root = os.path.join(self.temp_directory.name, 'media')
+        os.makedirs(media_root)
+        with open(os.path.join(media_root, 'фото.jpg'), 'wb') as image:
+            image.write(b'jpeg')
+        # сервер кладет в PATH_INFO байты UTF-8, прочитанные как latin-1
+        path = (settings.MEDIA_URL + 'фото.jpg').encode('utf-8').decode(
+            'latin-1')
+        with override_settings(MEDIA_ROOT=media_root):
+            status, _, body = self.request(path)
+        message = 'Media file with non-ASCII name should be served'
+        self.assertEqual(status, '200 OK', msg=message)
+        self.assertEqual(body, b'jpeg', msg=message)
+
+    def test_wsgi_passes_unknown_paths(self):
+        for path in (settings.STATIC_URL + 'missing.css',
+                     settings.STATIC_URL + '../secret', '/index/'):
+            with self.subTest(path=path):
+                _, _, body = self.request(path)
+                self.assertEqual(body, b'django',
+                                 msg='Unknown files should go to Django')
+
+
+class TestCompression(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='compressed')
+        for number in range(5):
+            Post.objects.create(text=f'Compressed post {number}',
+                                author=self.user)
+
+    def test_gzip_page(self):
+        response = self.client.get(reverse('index'),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        message = 'Page should be gzipped for clients that accept it'
+        self.assertEqual(response['Content-Encoding'], 'gzip', msg=message)
+        html = gzip.decompress(response.content).decode()
+        self.assertIn('Compressed post 4', html, msg=message)
+        message = 'Template indentation should be stripped'
+        self.assertNotIn('\n    ', html, msg=message)
+
+    def test_streaming_response(self):
+        url = reverse('sitemap_section', args=['posts', 0])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        message = 'Streaming response should be compressed on the fly'
+        self.assertEqual(response['Content-Encoding'], 'gzip', msg=message)
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'</urlset>', content, msg=message)
+
+    def test_brotli(self):
+        response = self.client.get(reverse('index'),
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        message = 'Brotli should be preferred when the client accepts it'
+        self.assertEqual(response['Content-Encoding'], 'br', msg=message)
+        self.assertIn(b'Compressed post 4',
+                      brotli.decompress(response.content), msg=message)
+        url = reverse('sitemap_section', args=['posts', 0])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br')
+        message = 'Streaming response should be compressed with brotli'
+        self.assertEqual(response['Content-Encoding'], 'br', msg=message)
+        content = brotli.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'</urlset>', content, msg=message)
+
+    def test_not_accepted(self):
+        response = self.client.get(reverse('index'),
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0')
+        message = 'Page should not be compressed when gzip is refused'
+        self.assertFalse(response.has_header('Content-Encoding'), msg=message)
+
+    def test_minify_keeps_protected_blocks(self):
+        html = '<div>\n    <p>a   b</p>\n</div><textarea>x\n    y</textarea>'
+        message = 'Whitespace inside textarea should be kept'
+        self.assertEqual(minify_html(html),
+                         '<div>\n<p>a b</p>\n</div><textarea>x\n    y'
+                         '</textarea>', msg=message)
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', is_staff=True)
+        self.user = User.objects.create_user(username='slow')
+        Post.objects.create(text='Slow post', author=self.user)
+        self.client.force_login(self.admin)
+
+    def tearDown(self):
+        setUpModule()
+
+    def test_signed_header(self):
+        response = self.client.get(
+            reverse('profile', args=[self.user.username]),
+            HTTP_X_PROFILE=profiler.make_token())
+        message = 'Request with a signed header should be profiled'
+        self.assertTrue(response.has_header('X-Profile-Id'), msg=message)
+        number = int(response['X-Profile-Id'])
+        response = self.client.get(
+            reverse('profiler_download', args=[number]), {'format': 'sql'})
+        message = 'SQL log of the profiled request should be downloadable'
+        self.assertContains(response, 'posts_post', msg_prefix=message)
+        response = self.client.get(reverse('profiler_index'))
+        self.assertContains(response, f'/{self.user.username}/',
+                            msg_prefix=message)
+
+    def test_bad_token(self):
+        response = self.client.get(reverse('index'),
+                                   HTTP_X_PROFILE='profile:forged')
+        message = 'Forged token should not enable profiling'
+        self.assertFalse(response.has_header('X-Profile-Id'), msg=message)
+
+    def test_sample_rate(self):
+        self.client.post(reverse('profiler_index'), {'rate': '1'})
+        response = self.client.get(reverse('index'))
+        message = 'Every request should be profiled at rate 1'
+        self.assertTrue(response.has_header('X-Profile-Id'), msg=message)
+        self.client.post(reverse('profiler_index'), {'rate': '0'})
+        response = self.client.get(reverse('index'))
+        message = 'Profiling should stop when rate is reset'
+        self.assertFalse(response.has_header('X-Profile-Id'), msg=message)
+
+    def test_rate_shared_between_processes(self):
+        # другой воркер меняет долю: меняется только общий кэш
+        caches['shared'].set(profiler.RATE_KEY, 1, None)
+        message = 'Process should keep its rate for a few seconds'
+        self.assertEqual(profiler.get_sample_rate(), 0, msg=message)
+        profiler._rate = (profiler._rate[0], 0)
+        message = 'Rate set by another process should be picked up'
+        self.assertEqual(profiler.get_sample_rate(), 1, msg=message)
+
+    def test_invalid_sample_rate(self):
+        response = self.client.post(reverse('profiler_index'),
+                                    {'rate': 'often'}, follow=True)
+        message = 'Invalid rate should be rejected with a message'
+        self.assertEqual(response.status_code, 200, msg=message)
+        self.assertContains(response, 'от 0 до 1', msg_prefix=message)
+        self.assertEqual(profiler.get_sample_rate(), 0, msg=message)
+        self.client.post(reverse('profiler_index'), {'rate': '5'})
+        message = 'Rate should be clamped to 1'
+        self.assertEqual(profiler.get_sample_rate(), 1, msg=message)
+
+    def test_sql_params_not_saved(self):
+        session_key = self.client.session.session_key
+        response = self.client.get(reverse('index'),
+                                   HTTP_X_PROFILE=profiler.make_token())
+        response = self.client.get(
+            reverse('profiler_download', args=[response['X-Profile-Id']]),
+            {'format': 'sql'})
+        message = 'SQL log should not contain query parameters'
+        self.assertContains(response, 'django_session', msg_prefix=message)
+        self.assertNotContains(response, session_key, msg_prefix=message)
+
+    def test_collapsed_stacks(self):
+        sampler = profiler.Sampler(threading.get_ident())
+        with self.settings(PROFILER_INTERVAL=0.001):
+            sampler.start()
+            time.sleep(0.05)
+            sampler.stop()
+        message = 'Sampler should record stacks of the watched thread'
+        self.assertTrue(any('test_collapsed_stacks' in stack
+                            for stack in sampler.stacks), msg=message)
+
+    def test_staff_only(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('profiler_download', args=[1]))
+        message = 'Profiles should be available to staff only'
+        self.assertEqual(response.status_code, 302, msg=message)
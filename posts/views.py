@@ -1,29 +1,67 @@
-from django.core.paginator import Paginator
+from collections import defaultdict
+
+from django.db.models import Count
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from .models import Post, Follow
 from .forms import PostForm, CommentForm
+from .archive import ArchiveFallbackList, get_post_or_404
+from .counters import view_counter
+from .lookups import get_group_or_404, get_user_or_404
+from .notifications import schedule_digest
+from .paginators import FeedPaginator
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import cache_page
+from tasks.queue import enqueue
+from yatube.ratelimit import ratelimit
+from yatube.sqlite import write_queue
 
 
 POST_ON_PAGE = 10
 
 
+def schedule_thumbnail(post):
+    if post.image:
+        enqueue('posts.make_thumbnail',
+                idempotency_key=f'thumbnail:{post.pk}:{post.image.name}',
+                post_id=post.pk)
+
+
+def add_comment_counts(page):
+    '''
+    Считает комментарии ко всем постам страницы одним запросом на модель,
+    чтобы шаблон не запрашивал их для каждого поста
+    '''
+    page.object_list = list(page.object_list)
+    ids_by_model = defaultdict(list)
+    for post in page.object_list:
+        ids_by_model[type(post)].append(post.pk)
+    counts = {}
+    for model, ids in ids_by_model.items():
+        comment_model = model.comments.field.model
+        counts[model] = dict(comment_model.objects
+                             .filter(post_id__in=ids).order_by()
+                             .values_list('post_id').annotate(Count('id')))
+    for post in page.object_list:
+        post.comment_count = counts[type(post)].get(post.pk, 0)
+    return page
+
+
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POST_ON_PAGE)
+    post_list = Post.objects.select_related('author', 'group')
+    paginator = FeedPaginator(post_list, POST_ON_PAGE, feed='index')
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = add_comment_counts(paginator.get_page(page_number))
     context = {'page': page, 'paginator': paginator, 'is_post': False}
     return render(request, 'index.html', context)
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, POST_ON_PAGE)
+    group = get_group_or_404(slug)
+    post_list = group.posts.select_related('author', 'group')
+    paginator = FeedPaginator(post_list, POST_ON_PAGE,
+                              feed=f'group:{group.pk}')
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = add_comment_counts(paginator.get_page(page_number))
     context = {'group': group,
                'page': page,
                'paginator': paginator,
@@ -31,23 +69,35 @@ def group_posts(request, slug):
     return render(request, 'group.html', context)
 
 
+def save_new_post(post):
+    post.save()
+    schedule_thumbnail(post)
+    schedule_digest(post)
+
+
 @login_required
+@ratelimit('post')
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            write_queue.submit(save_new_post, post)
             return redirect('index')
     context = {'form': form, 'is_create': True, 'post': None}
     return render(request, 'new_post.html', context)
 
 
+def save_edited_post(form):
+    schedule_thumbnail(form.save())
+
+
 @login_required
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    user = post.author
+    user = get_user_or_404(username)
+    post = get_object_or_404(Post, id=post_id, author=user)
+    post.author = user
     if user != request.user:
         return redirect('post', username=username, post_id=post_id)
     form = PostForm(request.POST or None,
@@ -55,7 +105,7 @@ def post_edit(request, username, post_id):
                     instance=post)
     if request.method == 'POST':
         if form.is_valid():
-            form.save()
+            write_queue.submit(save_edited_post, form)
             return redirect('post',
                             username=username,
                             post_id=post_id)
@@ -78,11 +128,14 @@ def get_following_count(user):
 
 
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    paginator = Paginator(post_list, POST_ON_PAGE)
+    user = get_user_or_404(username)
+    post_list = ArchiveFallbackList(
+        user.posts.select_related('author', 'group'),
+        user.archived_posts.select_related('author', 'group'))
+    paginator = FeedPaginator(post_list, POST_ON_PAGE,
+                              feed=f'author:{user.pk}')
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = add_comment_counts(paginator.get_page(page_number))
     context = {'profile_user': user,
                'following': check_following(request.user, user),
                'page': page,
@@ -94,16 +147,20 @@ def profile(request, username):
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    user = post.author
-    items = post.comments.all()
+    user = get_user_or_404(username)
+    post = get_post_or_404(user, post_id)
+    items = list(post.comments.select_related('author'))
+    post.comment_count = len(items)
     comment_form = CommentForm()
-    posts_count = user.posts.count()
+    posts_count = user.posts.count() + user.archived_posts.count()
+    if not post.is_archived:
+        view_counter.record(post.pk)
     context = {'comment_form': comment_form,
                'profile_user': user,
                'following': check_following(request.user, user),
                'post': post,
                'posts_count': posts_count,
+               'views': post.views + view_counter.pending(post.pk),
                'items': items,
                'is_post': True,
                'follower_count': get_follower_count(user),
@@ -125,16 +182,18 @@ def server_error(request):
 
 
 @login_required
+@ratelimit('comment')
 def add_comment(request, username, post_id):
     '''
     вызывается только методом POST, поэтому обработка только POST
     '''
+    get_object_or_404(Post, id=post_id, author=get_user_or_404(username))
     form = CommentForm(request.POST)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post_id = post_id
-        comment.save()
+        write_queue.submit(comment.save)
     return redirect('post',
                     username=username,
                     post_id=post_id)
@@ -144,24 +203,28 @@ def add_comment(request, username, post_id):
 def follow_index(request):
     post_list = Post.objects.filter(
         author__in=request.user.follower.all().values_list('author')
-    )
-    paginator = Paginator(post_list, POST_ON_PAGE)
+    ).select_related('author', 'group')
+    paginator = FeedPaginator(post_list, POST_ON_PAGE)
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = add_comment_counts(paginator.get_page(page_number))
     context = {'page': page, 'paginator': paginator, 'is_post': False}
     return render(request, 'follow.html', context)
 
 
 @login_required
+@ratelimit('follow', methods=None)
 def profile_follow(request, username):
-    following_user = get_object_or_404(User, username=username)
+    following_user = get_user_or_404(username)
     if request.user != following_user:
-        Follow.objects.get_or_create(user=request.user, author=following_user)
+        write_queue.submit(Follow.objects.get_or_create,
+                           user=request.user, author=following_user)
     return redirect('follow_index')
 
 
 @login_required
+@ratelimit('follow', methods=None)
 def profile_unfollow(request, username):
-    following_user = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=following_user).delete()
+    following_user = get_user_or_404(username)
+    write_queue.submit(Follow.objects.filter(
+        user=request.user, author=following_user).delete)
     return redirect('follow_index')
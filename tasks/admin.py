@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at',
+                    'finished')
+    list_filter = ('status', 'name')
+    search_fields = ('=idempotency_key',)
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created',
+                       'finished')
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,58 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.worker import run_workers
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчики фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int,
+                            default=settings.TASKS_WORKER_THREADS,
+                            help='Число потоков в каждом процессе')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Число процессов-обработчиков')
+        parser.add_argument('--poll', type=float,
+                            default=settings.TASKS_POLL_INTERVAL,
+                            help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        threads = max(options['threads'], 1)
+        processes = max(options['processes'], 1)
+        self.stdout.write(f'Запуск: процессов {processes}, '
+                          f'потоков {threads}')
+        if processes == 1:
+            self.serve(threads, options['poll'], options['once'])
+            return
+        # соединения нельзя наследовать дочерним процессам
+        connections.close_all()
+        children = [
+            multiprocessing.Process(
+                target=self.serve,
+                args=(threads, options['poll'], options['once']))
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+
+    def serve(self, threads, poll_interval, once):
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+        try:
+            run_workers(threads, poll_interval, stop_event, once)
+        except KeyboardInterrupt:
+            stop_event.set()
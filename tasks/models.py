@@ -0,0 +1,54 @@
+import json
+
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    payload = models.TextField(default='{}', verbose_name='Аргументы')
+    priority = models.SmallIntegerField(default=0, verbose_name='Приоритет')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=QUEUED, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name='Максимум попыток')
+    idempotency_key = models.CharField(max_length=200, unique=True,
+                                       blank=True, null=True,
+                                       verbose_name='Ключ идемпотентности')
+    run_at = models.DateTimeField(default=timezone.now,
+                                  verbose_name='Выполнить после')
+    locked_by = models.CharField(max_length=100, blank=True,
+                                 verbose_name='Обработчик')
+    locked_at = models.DateTimeField(blank=True, null=True,
+                                     verbose_name='Взята в работу')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created = models.DateTimeField('date created', auto_now_add=True)
+    finished = models.DateTimeField('date finished', blank=True, null=True)
+
+    class Meta:
+        ordering = ['-priority', 'run_at', ]
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_at']),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self):
+        return f'{self.name} [{self.status}]'
+
+    @property
+    def kwargs(self):
+        return json.loads(self.payload)
@@ -0,0 +1,150 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 5
+# столько завершенных задач удаляется одним DELETE
+CLEANUP_CHUNK_SIZE = 1000
+
+_registry = {}
+
+
+def task(name):
+    """
+    Регистрирует функцию как фоновую задачу с именем name.
+    """
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_task_function(name):
+    return _registry.get(name)
+
+
+def enqueue(name, priority=0, idempotency_key=None, delay=None,
+            max_attempts=None, **kwargs):
+    """
+    Ставит задачу в очередь. Повторный вызов с тем же idempotency_key
+    возвращает уже существующую задачу.
+    """
+    if max_attempts is None:
+        max_attempts = settings.TASKS_MAX_ATTEMPTS
+    run_at = timezone.now()
+    if delay is not None:
+        run_at += delay
+    fields = {'name': name,
+              'payload': json.dumps(kwargs),
+              'priority': priority,
+              'max_attempts': max_attempts,
+              'run_at': run_at}
+    if idempotency_key is None:
+        return Task.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(idempotency_key=idempotency_key,
+                                       **fields)
+    except IntegrityError:
+        return Task.objects.get(idempotency_key=idempotency_key)
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь задачи, обработчик которых пропал.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    return Task.objects.filter(status=Task.RUNNING,
+                               locked_at__lt=deadline).update(
+        status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def delete_finished():
+    """
+    Удаляет выполненные и упавшие задачи старше TASKS_RETENTION секунд.
+    Удаляет пачками, чтобы не держать блокировку записи долго.
+    Возвращает число удаленных задач.
+    """
+    if settings.TASKS_RETENTION is None:
+        return 0
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_RETENTION)
+    finished = Task.objects.filter(status__in=[Task.DONE, Task.FAILED],
+                                   finished__lt=deadline).order_by()
+    deleted = 0
+    while True:
+        pks = list(finished.values_list('pk', flat=True)[:CLEANUP_CHUNK_SIZE])
+        if not pks:
+            return deleted
+        deleted += Task.objects.filter(pk__in=pks).delete()[0]
+
+
+def claim(worker_id):
+    """
+    Забирает самую приоритетную готовую задачу. Захват делается условным
+    UPDATE, поэтому одну задачу не возьмут два обработчика.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'id').values_list('pk', flat=True)
+    for pk in candidates[:CLAIM_CANDIDATES]:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker_id, locked_at=now,
+            attempts=F('attempts') + 1)
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(task_obj):
+    func = get_task_function(task_obj.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {task_obj.name!r}')
+        func(**task_obj.kwargs)
+    except Exception:
+        logger.exception('Task %s (%s) failed', task_obj.pk, task_obj.name)
+        task_obj.last_error = traceback.format_exc()
+        task_obj.locked_by = ''
+        task_obj.locked_at = None
+        if func is not None and task_obj.attempts < task_obj.max_attempts:
+            backoff = settings.TASKS_RETRY_DELAY * 2 ** (task_obj.attempts - 1)
+            task_obj.status = Task.QUEUED
+            task_obj.run_at = timezone.now() + timedelta(seconds=backoff)
+        else:
+            task_obj.status = Task.FAILED
+            task_obj.finished = timezone.now()
+        task_obj.save()
+        return False
+    task_obj.status = Task.DONE
+    task_obj.finished = timezone.now()
+    task_obj.save(update_fields=['status', 'finished'])
+    return True
+
+
+def run_next(worker_id='inline'):
+    task_obj = claim(worker_id)
+    if task_obj is None:
+        return None
+    execute(task_obj)
+    return task_obj
+
+
+def run_pending(worker_id='inline'):
+    """
+    Выполняет все готовые задачи в текущем потоке.
+    """
+    count = 0
+    while run_next(worker_id) is not None:
+        count += 1
+    return count
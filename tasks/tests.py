@@ -0,0 +1,112 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.queue import (delete_finished, enqueue, run_next, run_pending,
+                         task)
+from tasks.worker import requeue_if_due
+
+calls = []
+
+
+@task('tasks.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tasks.tests.explode')
+def explode():
+    raise ValueError('boom')
+
+
+class TestTaskQueue(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_pending(self):
+        enqueue('tasks.tests.record', value=1)
+        enqueue('tasks.tests.record', value=2)
+        message = 'All queued tasks should be executed'
+        self.assertEqual(run_pending(), 2, msg=message)
+        self.assertEqual(sorted(calls), [1, 2], msg=message)
+        message = 'Executed tasks should be marked as done'
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists(),
+                         msg=message)
+
+    def test_priority(self):
+        enqueue('tasks.tests.record', value='low')
+        enqueue('tasks.tests.record', priority=10, value='high')
+        run_pending()
+        message = 'Task with higher priority should run first'
+        self.assertEqual(calls, ['high', 'low'], msg=message)
+
+    def test_idempotency_key(self):
+        first = enqueue('tasks.tests.record', idempotency_key='once', value=1)
+        second = enqueue('tasks.tests.record', idempotency_key='once', value=2)
+        message = 'Same idempotency key should not create second task'
+        self.assertEqual(first.pk, second.pk, msg=message)
+        self.assertEqual(Task.objects.count(), 1, msg=message)
+
+    def test_delayed_task(self):
+        enqueue('tasks.tests.record', delay=timedelta(hours=1), value=1)
+        message = 'Delayed task should not run before its time'
+        self.assertIsNone(run_next(), msg=message)
+
+    @override_settings(TASKS_RETRY_DELAY=0)
+    def test_retries(self):
+        enqueue('tasks.tests.explode', max_attempts=2)
+        run_next()
+        task_obj = Task.objects.get()
+        message = 'Failed task should be queued again'
+        self.assertEqual(task_obj.status, Task.QUEUED, msg=message)
+        self.assertIn('boom', task_obj.last_error, msg=message)
+        run_next()
+        task_obj.refresh_from_db()
+        message = 'Task should fail after max attempts'
+        self.assertEqual(task_obj.status, Task.FAILED, msg=message)
+        self.assertEqual(task_obj.attempts, 2, msg=message)
+
+    def test_unknown_task(self):
+        enqueue('tasks.tests.missing')
+        run_next()
+        message = 'Unknown task should fail without retries'
+        self.assertEqual(Task.objects.get().status, Task.FAILED, msg=message)
+
+    def test_scheduled_time(self):
+        task_obj = enqueue('tasks.tests.record', value=1)
+        message = 'Task should be ready to run right away'
+        self.assertLessEqual(task_obj.run_at, timezone.now(), msg=message)
+
+    def test_periodic_requeue(self):
+        task_obj = enqueue('tasks.tests.record', value=1)
+        Task.objects.filter(pk=task_obj.pk).update(
+            status=Task.RUNNING, locked_by='dead:1:0',
+            locked_at=timezone.now() - timedelta(days=1))
+        message = 'Requeue should wait for its interval'
+        last_requeue = time.monotonic()
+        self.assertEqual(requeue_if_due(last_requeue), last_requeue,
+                         msg=message)
+        self.assertEqual(Task.objects.get().status, Task.RUNNING,
+                         msg=message)
+        message = 'Task of a crashed worker should be queued again'
+        requeue_if_due(last_requeue - settings.TASKS_REQUEUE_INTERVAL)
+        self.assertEqual(Task.objects.get().status, Task.QUEUED, msg=message)
+
+    @override_settings(TASKS_RETENTION=3600)
+    def test_delete_finished(self):
+        old = enqueue('tasks.tests.record', value='old')
+        fresh = enqueue('tasks.tests.record', value='fresh')
+        queued = enqueue('tasks.tests.record', delay=timedelta(days=1),
+                         value='queued')
+        run_pending()
+        Task.objects.filter(pk=old.pk).update(
+            finished=timezone.now() - timedelta(hours=2))
+        message = 'Only old finished tasks should be deleted'
+        self.assertEqual(delete_finished(), 1, msg=message)
+        self.assertEqual(
+            set(Task.objects.values_list('pk', flat=True)),
+            {fresh.pk, queued.pk}, msg=message)
@@ -0,0 +1,79 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .queue import delete_finished, requeue_stale, run_next
+
+logger = logging.getLogger(__name__)
+
+
+class Worker(threading.Thread):
+    """
+    Поток, который забирает задачи из очереди, пока не будет остановлен.
+    """
+
+    def __init__(self, number, stop_event, poll_interval, once=False):
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{number}'
+        super().__init__(name=self.worker_id, daemon=True)
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.once = once
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    task_obj = run_next(self.worker_id)
+                except Exception:
+                    logger.exception('Worker %s failed to run task',
+                                     self.worker_id)
+                    task_obj = None
+                if task_obj is None:
+                    if self.once:
+                        break
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+
+def requeue_if_due(last_requeue):
+    """
+    Раз в TASKS_REQUEUE_INTERVAL возвращает в очередь задачи упавших
+    обработчиков, а не только при запуске, и удаляет старые завершенные
+    задачи. Возвращает время проверки.
+    """
+    now = time.monotonic()
+    if (last_requeue is not None
+            and now - last_requeue < settings.TASKS_REQUEUE_INTERVAL):
+        return last_requeue
+    try:
+        close_old_connections()
+        requeued = requeue_stale()
+        deleted = delete_finished()
+    except Exception:
+        logger.exception('Failed to requeue stale tasks')
+    else:
+        if requeued:
+            logger.warning('Requeued %s stale tasks', requeued)
+        if deleted:
+            logger.info('Deleted %s finished tasks', deleted)
+    return now
+
+
+def run_workers(threads, poll_interval, stop_event, once=False):
+    last_requeue = requeue_if_due(None)
+    workers = [Worker(number, stop_event, poll_interval, once)
+               for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    # join с таймаутом, чтобы главный поток получал KeyboardInterrupt
+    while any(worker.is_alive() for worker in workers):
+        for worker in workers:
+            worker.join(poll_interval)
+        last_requeue = requeue_if_due(last_requeue)
@@ -1,3 +1,23 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
 
-# Register your models here.
+from posts.deletion import schedule_user_deletion
+
+User = get_user_model()
+
+
+class YatubeUserAdmin(UserAdmin):
+    actions = ['delete_in_background']
+
+    def delete_in_background(self, request, queryset):
+        users = list(queryset)
+        for user in users:
+            schedule_user_deletion(user)
+        self.message_user(request, f'Отключено и поставлено на удаление '
+                                   f'аккаунтов: {len(users)}')
+    delete_in_background.short_description = 'Удалить в фоне'
+
+
+admin.site.unregister(User)
+admin.site.register(User, YatubeUserAdmin)
@@ -1,3 +1,29 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from tasks.models import Task
+
+User = get_user_model()
+
+
+class TestUserAdmin(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin')
+        self.client.force_login(self.admin)
+
+    def test_delete_in_background_action(self):
+        user = User.objects.create_user(username='to_delete')
+        self.client.post(reverse('admin:auth_user_changelist'),
+                         {'action': 'delete_in_background',
+                          '_selected_action': [user.pk]})
+        user.refresh_from_db()
+        message = 'Admin action should disable account'
+        self.assertFalse(user.is_active, msg=message)
+        message = 'Admin action should schedule purge task'
+        self.assertTrue(
+            Task.objects.filter(name='posts.purge_user',
+                                idempotency_key__startswith=f'purge_user:'
+                                                            f'{user.pk}:')
+            .exists(), msg=message)
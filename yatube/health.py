@@ -0,0 +1,12 @@
+from django.http import JsonResponse
+
+from . import warmup
+
+
+def ready(request):
+    """
+    Прогрев идет при импорте yatube/wsgi.py, до появления WSGI-приложения,
+    поэтому процесс, который отвечает на запрос, уже прогрет. Отдает время
+    этапов прогрева.
+    """
+    return JsonResponse({'status': 'ready', 'timings': warmup.timings})
@@ -0,0 +1,148 @@
+import gzip
+import re
+import zlib
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/xml',
+                      'application/javascript', 'image/svg+xml')
+MIN_LENGTH = 200
+# потоковый ответ сбрасывается клиенту после стольких байт исходника
+STREAM_FLUSH_SIZE = 16 * 1024
+ACCEPT_ENCODING = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+# внутри этих тегов пробелы значимы
+PROTECTED_BLOCKS = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)',
+    re.IGNORECASE | re.DOTALL)
+WHITESPACE = re.compile(r'\s+')
+
+
+def collapse_whitespace(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def minify_html(html):
+    """
+    Схлопывает пробелы и отступы шаблонов вне pre/textarea/script/style.
+    Браузер показывает страницу так же, а передается она короче.
+    """
+    parts = PROTECTED_BLOCKS.split(html)
+    result = []
+    # split с двумя группами дает: текст, блок, имя тега, текст, ...
+    for index in range(0, len(parts), 3):
+        result.append(WHITESPACE.sub(collapse_whitespace, parts[index]))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    return ''.join(result)
+
+
+def parse_accept_encoding(accept_encoding):
+    """
+    'gzip;q=0, br' -> {'gzip': 0.0, 'br': 1.0}
+    """
+    accepted = {}
+    for name, quality in ACCEPT_ENCODING.findall(accept_encoding):
+        try:
+            accepted[name.lower()] = float(quality or 1)
+        except ValueError:
+            accepted[name.lower()] = 0
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    accepted = parse_accept_encoding(accept_encoding)
+    if accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, 6, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    pending = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= STREAM_FLUSH_SIZE:
+            # отдаем накопленное клиенту, не дожидаясь конца потока
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы brotli или gzip, в том числе потоковые. Сжатые тела
+    не кэшируются: страницы вошедших пользователей почти всегда
+    уникальны (шапка, CSRF-токен) и только вытесняли бы из кэша полезные
+    записи, а сжатие быстрого уровня дешевле промаха по кэшу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '')
+        if (response.status_code != 200
+                or response.has_header('Content-Encoding')
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        is_html = content_type.startswith('text/html')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+        if response.streaming:
+            if encoding is None:
+                return response
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            content = self.get_content(response, is_html, encoding)
+            if content is None:
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        if encoding is None:
+            return response
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
+
+    def get_content(self, response, is_html, encoding):
+        """
+        Возвращает новое тело ответа или None, если его не нужно менять.
+        """
+        minify = is_html and settings.HTML_MINIFY
+        if encoding is None or len(response.content) < MIN_LENGTH:
+            if not minify:
+                return None
+            return self.minify(response)
+        body = self.minify(response) if minify else response.content
+        return compress(body, encoding)
+
+    def minify(self, response):
+        charset = response.charset
+        return minify_html(response.content.decode(charset)).encode(charset)
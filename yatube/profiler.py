@@ -0,0 +1,237 @@
+"""
+Профилирование отдельных запросов в бою: выборка стеков потока запроса
+и журнал его SQL. Включается подписанным заголовком или долей запросов,
+заданной на странице admin/profiler/. Результаты хранятся в общем для
+всех процессов кэше 'shared' в кольцевом буфере и скачиваются в формате
+collapsed stacks (flamegraph.pl, speedscope).
+
+Доля запросов тоже хранится в 'shared'; каждый процесс перечитывает ее
+не чаще раза в PROFILER_RATE_CHECK_INTERVAL секунд, поэтому включение
+и выключение доходит до всех воркеров с такой задержкой.
+"""
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core import signing
+from django.core.cache import caches
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+
+SALT = 'yatube.profiler'
+RATE_KEY = 'profiler:rate'
+COUNTER_KEY = 'profiler:counter'
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def check_token(token):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+# доля из общего кэша и момент, до которого ей можно верить
+_rate = (None, 0)
+
+
+def get_sample_rate():
+    global _rate
+    rate, expires = _rate
+    if rate is not None and time.monotonic() < expires:
+        return rate
+    rate = caches['shared'].get(RATE_KEY, 0)
+    _rate = (rate, time.monotonic() + settings.PROFILER_RATE_CHECK_INTERVAL)
+    return rate
+
+
+def set_sample_rate(rate):
+    global _rate
+    caches['shared'].set(RATE_KEY, rate, None)
+    _rate = (rate, time.monotonic() + settings.PROFILER_RATE_CHECK_INTERVAL)
+
+
+def parse_sample_rate(value):
+    """
+    '0.5' -> 0.5, '7' -> 1.0; None, если это не число.
+    """
+    try:
+        rate = float(value or 0)
+    except ValueError:
+        return None
+    if not math.isfinite(rate):
+        return None
+    return min(max(rate, 0), 1)
+
+
+def should_profile(request):
+    token = request.META.get(settings.PROFILER_HEADER)
+    if token:
+        return check_token(token)
+    rate = get_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def format_frame(frame):
+    code = frame.f_code
+    return (f'{code.co_name} ({os.path.basename(code.co_filename)}'
+            f':{code.co_firstlineno})')
+
+
+def collapse_stack(frame):
+    names = []
+    while frame is not None:
+        names.append(format_frame(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """
+    Раз в PROFILER_INTERVAL секунд снимает стек потока запроса. Сам поток
+    запроса не замедляется, кроме как на захват GIL для снимка.
+    """
+
+    def __init__(self, thread_id):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = settings.PROFILER_INTERVAL
+        while not self.stopped.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class QueryLog:
+    """
+    Журнал SQL запроса. Параметры не сохраняются: среди них бывают ключи
+    сессий и другие секреты, а профиль читают все сотрудники.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries.append((duration, sql))
+
+
+def save_profile(profile):
+    """
+    Кладет профиль в один из PROFILER_BUFFER_SIZE слотов по кругу,
+    самый старый профиль перезаписывается. incr у DatabaseCache не
+    атомарен, и при одновременной записи из двух процессов один профиль
+    может затереть другой; для выборочного профилирования это не страшно.
+    """
+    shared = caches['shared']
+    shared.add(COUNTER_KEY, 0, None)
+    number = shared.incr(COUNTER_KEY)
+    profile['number'] = number
+    slot = number % settings.PROFILER_BUFFER_SIZE
+    shared.set(f'profiler:slot:{slot}', profile,
+               settings.PROFILER_CACHE_TIMEOUT)
+    return number
+
+
+def get_profiles():
+    keys = [f'profiler:slot:{slot}'
+            for slot in range(settings.PROFILER_BUFFER_SIZE)]
+    profiles = caches['shared'].get_many(keys).values()
+    return sorted(profiles, key=lambda profile: -profile['number'])
+
+
+def get_profile(number):
+    slot = number % settings.PROFILER_BUFFER_SIZE
+    profile = caches['shared'].get(f'profiler:slot:{slot}')
+    if profile is None or profile['number'] != number:
+        raise Http404
+    return profile
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+        sampler = Sampler(threading.get_ident())
+        queries = QueryLog()
+        started = time.time()
+        sampler.start()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            sampler.stop()
+        number = save_profile({
+            'path': request.get_full_path(),
+            'method': request.method,
+            'status': response.status_code,
+            'started': started,
+            'duration': time.time() - started,
+            'stacks': dict(sampler.stacks),
+            'queries': queries.queries,
+        })
+        response['X-Profile-Id'] = str(number)
+        return response
+
+
+@staff_member_required
+def profiler_index(request):
+    if request.method == 'POST':
+        rate = parse_sample_rate(request.POST.get('rate'))
+        if rate is None:
+            messages.error(request, 'Доля должна быть числом от 0 до 1')
+        else:
+            set_sample_rate(rate)
+        return redirect('profiler_index')
+    context = {'profiles': get_profiles(),
+               'rate': get_sample_rate(),
+               'header': settings.PROFILER_HEADER[len('HTTP_'):]
+               .replace('_', '-').title(),
+               'token': make_token(),
+               'check_interval': settings.PROFILER_RATE_CHECK_INTERVAL}
+    return render(request, 'admin/profiler.html', context)
+
+
+@staff_member_required
+def profiler_download(request, number):
+    profile = get_profile(number)
+    if request.GET.get('format') == 'sql':
+        lines = [f'{duration * 1000:.2f} ms\t{sql}'
+                 for duration, sql in profile['queries']]
+        filename = f'profile-{number}.sql.txt'
+    else:
+        lines = [f'{stack} {count}'
+                 for stack, count in profile['stacks'].items()]
+        filename = f'profile-{number}.collapsed'
+    response = HttpResponse('\n'.join(lines) + '\n',
+                            content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,110 @@
+"""
+Аудит SQL-запросов в тестах: полные просмотры больших таблиц, N+1
+и превышение бюджета запросов на представление.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.urls import Resolver404, resolve
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+LIMIT_RE = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+
+class QueryAuditError(AssertionError):
+    pass
+
+
+class QueryAudit:
+    def __init__(self, budget=None, label=''):
+        self.budget = budget
+        self.label = label
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def is_full_scan(self, sql, detail):
+        """
+        'SCAN t' читает всю таблицу. Обход по индексу ('USING INDEX')
+        допустим, только если LIMIT его останавливает, а обход одного
+        индекса без таблицы ('USING COVERING INDEX') — всегда.
+        """
+        if 'USING COVERING INDEX' in detail:
+            return False
+        if 'USING INDEX' in detail:
+            return not LIMIT_RE.search(sql)
+        return True
+
+    def find_scans(self):
+        if connection.vendor != 'sqlite':
+            return []
+        large = set(settings.QUERY_AUDIT_LARGE_TABLES)
+        problems = []
+        for sql, params in self.queries:
+            if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                continue
+            for detail in self.explain(sql, params):
+                match = SCAN_RE.match(detail)
+                if (match and match.group(1) in large
+                        and self.is_full_scan(sql, match.group(2))):
+                    problems.append(f'full scan of {match.group(1)}: {sql}')
+        return problems
+
+    def find_repeats(self):
+        threshold = settings.QUERY_AUDIT_REPEAT_THRESHOLD
+        counts = Counter(sql for sql, _ in self.queries)
+        return [f'{count} repeated queries (N+1): {sql}'
+                for sql, count in counts.items() if count >= threshold]
+
+    def problems(self):
+        problems = self.find_scans() + self.find_repeats()
+        if self.budget is not None and len(self.queries) > self.budget:
+            problems.append(f'{len(self.queries)} queries, '
+                            f'budget is {self.budget}')
+        return problems
+
+    def check(self):
+        problems = self.problems()
+        if problems:
+            raise QueryAuditError(
+                f'Query audit failed {self.label}:\n' + '\n'.join(problems))
+
+
+@contextmanager
+def audit_queries(budget=None, label=''):
+    """
+    Записывает запросы внутри блока и после него проверяет их планы.
+    """
+    audit = QueryAudit(budget, label)
+    with connection.execute_wrapper(audit):
+        yield audit
+    audit.check()
+
+
+class AuditedClient(Client):
+    """
+    Тестовый клиент, который проверяет запросы каждого обращения
+    к представлению с бюджетом из QUERY_AUDIT_BUDGETS.
+    """
+
+    def request(self, **request):
+        path = request.get('PATH_INFO', '')
+        try:
+            url_name = resolve(path).url_name
+        except Resolver404:
+            url_name = None
+        budget = settings.QUERY_AUDIT_BUDGETS.get(url_name)
+        with audit_queries(budget, f'for {path} ({url_name})'):
+            return super().request(**request)
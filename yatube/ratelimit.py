@@ -0,0 +1,141 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """
+    '10/m' -> (10, 60)
+    """
+    limit, period = rate.split('/')
+    return int(limit), PERIODS[period]
+
+
+def get_client_ip(request):
+    header = settings.RATELIMIT_IP_HEADER
+    if header and request.META.get(header):
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_identities(request):
+    identities = [f'ip:{get_client_ip(request)}']
+    if request.user.is_authenticated:
+        identities.append(f'user:{request.user.pk}')
+    return identities
+
+
+def hit(key, limit, period, now):
+    """
+    Скользящее окно поверх двух счетчиков фиксированных окон: текущего и
+    предыдущего, вес предыдущего убывает по мере прохождения текущего.
+    Возвращает, сколько секунд ждать, или 0, если запрос разрешен.
+    """
+    cache = caches[settings.RATELIMIT_CACHE]
+    window = int(now // period)
+    current_key = f'{key}:{window}'
+    # add атомарно создает счетчик, incr атомарно его увеличивает
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # счетчик вытеснили между add и incr
+        cache.add(current_key, 1, period * 2)
+        current = 1
+    previous = cache.get(f'{key}:{window - 1}', 0)
+    elapsed = now - window * period
+    weighted = previous * (1 - elapsed / period) + current
+    if weighted <= limit:
+        return 0
+    # отклоненный запрос не должен продлевать блокировку
+    try:
+        cache.decr(current_key)
+    except ValueError:
+        pass
+    return max(1, math.ceil(period - elapsed))
+
+
+def check(request, policy):
+    rate = settings.RATELIMIT_POLICIES.get(policy)
+    if rate is None:
+        logger.error('Rate limit policy %s is not configured', policy)
+        return 0
+    limit, period = parse_rate(rate)
+    now = time.time()
+    retry_after = 0
+    for identity in get_identities(request):
+        key = f'rl:{policy}:{identity}'
+        retry_after = max(retry_after, hit(key, limit, period, now))
+    with _metrics_lock:
+        _metrics[(policy, 'blocked' if retry_after else 'allowed')] += 1
+    if retry_after:
+        logger.warning('Rate limit %s exceeded by %s', policy,
+                       ', '.join(get_identities(request)))
+    return retry_after
+
+
+def get_metrics():
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+@staff_member_required
+def ratelimit_metrics(request):
+    """
+    Сколько запросов каждая политика пропустила и отклонила с запуска
+    процесса. Счетчики свои у каждого воркера, поэтому в ответе есть pid.
+    """
+    policies = {}
+    for (policy, outcome), count in get_metrics().items():
+        policies.setdefault(policy, {'allowed': 0, 'blocked': 0})
+        policies[policy][outcome] = count
+    return JsonResponse({'pid': os.getpid(), 'policies': policies})
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Слишком много запросов, попробуйте позже',
+                            status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(policy, methods=('POST',)):
+    """
+    Ограничивает частоту запросов к view по пользователю и IP.
+    methods=None — ограничивать запросы любым методом.
+    Политика без записи в RATELIMIT_POLICIES — ошибка конфигурации
+    при импорте view.
+    """
+    if policy not in settings.RATELIMIT_POLICIES:
+        raise ImproperlyConfigured(
+            f'Rate limit policy {policy!r} is missing from '
+            f'RATELIMIT_POLICIES')
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if (settings.RATELIMIT_ENABLED
+                    and (methods is None or request.method in methods)):
+                retry_after = check(request, policy)
+                if retry_after:
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -38,6 +38,7 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'users',
     'posts',
+    'tasks',
     'django.contrib.sites',
     'django.contrib.flatpages',
     'django.contrib.admin',
@@ -51,6 +52,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'yatube.profiler.ProfilerMiddleware',
+    'yatube.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,17 +85,56 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# шаблоны, которые компилируются при старте воркера
+WARMUP_TEMPLATES = [
+    'base.html',
+    'index.html',
+    'group.html',
+    'profile.html',
+    'post.html',
+    'follow.html',
+    'includes/post_block.html',
+    'includes/paginator.html',
+    'includes/profile_block.html',
+    'misc/404.html',
+]
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# боевой режим SQLite: WAL, PRAGMA из SQLITE_PRAGMAS для каждого
+# соединения, постоянные соединения и запись через yatube.sqlite.write_queue
+SQLITE_PRODUCTION = False
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600 if SQLITE_PRODUCTION else 0,
     }
 }
 
+SQLITE_PRAGMAS = {
+    # читатели не ждут писателя, писатель не ждет читателей
+    'journal_mode': 'wal',
+    # в WAL fsync только на контрольной точке, коммит остается атомарным
+    'synchronous': 'normal',
+    # отрицательное значение — в килобайтах: 64 МБ кэша страниц
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    # сколько ждать блокировку вместо немедленного 'database is locked', мс
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+WRITE_QUEUE_ENABLED = SQLITE_PRODUCTION
+# записей в одной транзакции и сколько ждать следующую перед коммитом, с
+WRITE_QUEUE_BATCH_SIZE = 50
+WRITE_QUEUE_MAX_WAIT = 0.002
+# сколько запрос ждет выполнения своей записи, с
+WRITE_QUEUE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -136,6 +178,13 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# статику и медиа отдает yatube.static на уровне WSGI;
+# файлы с хэшем в имени кэшируются браузером навсегда
+if not DEBUG:
+    STATICFILES_STORAGE = 'yatube.storage.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE = 60
+MEDIA_MAX_AGE = 86400
+
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 # LOGOUT_REDIRECT_URL = 'index'
@@ -143,10 +192,120 @@ LOGIN_REDIRECT_URL = 'index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# дайджесты новых постов для подписчиков: окно агрегации (с),
+# писем в одной пачке send_messages и пауза между пачками (с)
+DIGEST_WINDOW = 3600
+DIGEST_BATCH_SIZE = 100
+DIGEST_THROTTLE = 0.5
+
 SITE_ID = 1
 
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # отдельно от default, чтобы другие записи не вытесняли счетчики
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+    },
+    # общий для всех процессов кэш для редких записей, которые должны
+    # сразу увидеть все воркеры; таблицу создает миграция
+    # posts.0015_shared_cache_table
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_shared',
+    },
 }
+
+RATELIMIT_ENABLED = True
+# LocMemCache у каждого процесса свой, и при N воркерах настоящий предел
+# в N раз больше заданного. В бою здесь нужен общий кэш с атомарным incr
+# (memcached, redis)
+RATELIMIT_CACHE = 'ratelimit'
+# заголовок с адресом клиента за прокси, например 'HTTP_X_FORWARDED_FOR'.
+# За обратным прокси без него у всех клиентов один REMOTE_ADDR — адрес
+# прокси, и ограничения по IP становятся общими на весь сайт: signup
+# ограничивается только по IP, и 5 регистраций в час будут на всех.
+# Задавать, только если прокси перезаписывает заголовок, иначе клиент
+# подставит в него любой адрес
+RATELIMIT_IP_HEADER = None
+RATELIMIT_POLICIES = {
+    'post': '10/m',
+    'comment': '20/m',
+    'follow': '60/m',
+    'signup': '5/h',
+}
+
+# сжимать HTML, убирая пробелы и отступы шаблонов
+HTML_MINIFY = True
+
+# готовый HTML статических страниц (about-author, about-spec), с
+FLATPAGE_CACHE_TIMEOUT = 86400
+# версия ключей этих страниц хранится в общем кэше 'shared'; процесс
+# перечитывает ее не чаще, чем раз в столько секунд
+FLATPAGE_VERSION_CHECK_INTERVAL = 5
+
+# адресов в одном файле sitemap (протокол разрешает до 50 000)
+SITEMAP_SHARD_SIZE = 50000
+SITEMAP_CACHE_TIMEOUT = 3600
+
+# как долго лента (общая, группы, автора) показывает закэшированное
+# число постов для номеров страниц, с
+FEED_COUNT_TIMEOUT = 300
+
+# как долго админка использует посчитанное число строк таблицы, с
+TABLE_COUNT_TIMEOUT = 60
+
+# кэш пользователей и групп, которые ищутся по адресу страницы, с.
+# Сигналы сбрасывают его только в своем процессе, поэтому в остальных
+# воркерах переименование видно не позже чем через столько секунд
+OBJECT_CACHE_TIMEOUT = 60
+OBJECT_CACHE_MISSING_TIMEOUT = 30
+
+# как часто процесс записывает накопленные просмотры постов, с
+POST_VIEWS_FLUSH_INTERVAL = 30
+
+# строк в одной транзакции при фоновом удалении аккаунта
+USER_PURGE_BATCH_SIZE = 500
+
+# посты старше стольких дней переносятся в архив командой archive_posts
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# проверки yatube.queryaudit в тестах: таблицы, которые нельзя читать
+# целиком, сколько одинаковых запросов считать N+1 и бюджеты представлений
+QUERY_AUDIT_LARGE_TABLES = ('posts_post', 'posts_comment', 'posts_follow',
+                            'posts_archivedpost', 'posts_archivedcomment',
+                            'auth_user')
+QUERY_AUDIT_REPEAT_THRESHOLD = 3
+QUERY_AUDIT_BUDGETS = {
+    'index': 6,
+    'group': 7,
+    'follow_index': 6,
+    'profile': 11,
+    'post': 11,
+}
+
+# профилирование запросов: заголовок с подписанным токеном (выдается на
+# странице admin/profiler/), срок жизни токена, шаг выборки стеков, с,
+# и сколько последних профилей хранить
+PROFILER_HEADER = 'HTTP_X_PROFILE'
+PROFILER_TOKEN_MAX_AGE = 3600
+PROFILER_INTERVAL = 0.005
+PROFILER_BUFFER_SIZE = 50
+PROFILER_CACHE_TIMEOUT = 86400
+# как часто процесс перечитывает долю профилируемых запросов, с
+PROFILER_RATE_CHECK_INTERVAL = 5
+
+TASKS_WORKER_THREADS = 2
+TASKS_POLL_INTERVAL = 1.0
+TASKS_MAX_ATTEMPTS = 3
+# пауза перед повтором упавшей задачи, удваивается с каждой попыткой, с
+TASKS_RETRY_DELAY = 10
+# через сколько секунд задача без обработчика возвращается в очередь
+TASKS_LOCK_TIMEOUT = 600
+# как часто runworkers ищет такие задачи и удаляет старые завершенные, с
+TASKS_REQUEUE_INTERVAL = 60
+# сколько хранить выполненные и упавшие задачи, с; None — хранить всегда
+TASKS_RETENTION = 7 * 86400
@@ -0,0 +1,166 @@
+"""
+Боевой режим SQLite: настройки соединения через PRAGMA и очередь записи,
+через которую все изменения идут одним потоком и коммитятся пачками.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+from concurrent import futures
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import (close_old_connections, connection, connections,
+                       transaction)
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    Обработчик connection_created: настраивает каждое новое соединение.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRODUCTION:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def database_copy():
+    """
+    Переключает соединения default на временную копию базы SQLite
+    и обратно.
+    Копия снимается через backup API, согласованно и без остановки
+    сервера; замеры и нагрузочные тесты пишут в нее, а не в рабочую базу.
+    """
+    database = connections.databases['default']
+    original = dict(database)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'copy.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        # соединения открываются заново уже к копии
+        connections.close_all()
+        database['NAME'] = path
+        try:
+            yield path
+        finally:
+            connections.close_all()
+            database.clear()
+            database.update(original)
+
+
+class WriteQueue:
+    """
+    Единственный писатель: функции записи выполняются в одном потоке,
+    несколько подряд в одной транзакции (group commit), каждая в своей
+    точке сохранения, чтобы ошибка одной не откатывала остальные.
+    Запросы не спорят за блокировку записи SQLite, а fsync делается
+    один раз на пачку. Без WRITE_QUEUE_ENABLED функция выполняется сразу
+    в вызывающем потоке.
+
+    Очередь своя у каждого процесса: между воркерами запись по-прежнему
+    разделяет блокировка SQLite, очередь убирает лишь споры потоков
+    одного процесса.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Выполняет func и возвращает ее результат после коммита. Если
+        запись не началась за WRITE_QUEUE_TIMEOUT, она отменяется и
+        поднимается concurrent.futures.TimeoutError.
+        """
+        if (not settings.WRITE_QUEUE_ENABLED
+                or threading.current_thread() is self._thread):
+            # вложенный вызов из самого писателя ждал бы сам себя, поэтому
+            # выполняется сразу в точке сохранения текущей пачки
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        with self._lock:
+            if self._pid != os.getpid():
+                # после fork поток родителя в этом процессе не работает
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is not None:
+                    logger.error('SQLite writer thread died, restarting')
+                self._start_writer()
+        future = futures.Future()
+        self._queue.put((future, func, args, kwargs))
+        try:
+            return future.result(timeout=settings.WRITE_QUEUE_TIMEOUT)
+        except futures.TimeoutError:
+            if future.cancel():
+                raise
+        # запись уже выполняется, ее результат вот-вот будет
+        return future.result()
+
+    def _start_writer(self):
+        self._thread = threading.Thread(
+            target=self._run_writer, args=(self._queue,),
+            name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def _take_batch(self, jobs):
+        batch = [jobs.get()]
+        while len(batch) < settings.WRITE_QUEUE_BATCH_SIZE:
+            try:
+                batch.append(jobs.get(timeout=settings.WRITE_QUEUE_MAX_WAIT))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_writer(self, jobs):
+        while True:
+            # отмененные по таймауту записи пропускаются
+            batch = [job for job in self._take_batch(jobs)
+                     if job[0].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            results = []
+            try:
+                close_old_connections()
+                with transaction.atomic():
+                    for future, func, args, kwargs in batch:
+                        try:
+                            with transaction.atomic():
+                                results.append((future, func(*args, **kwargs),
+                                                None))
+                        except Exception as error:
+                            results.append((future, None, error))
+            except Exception as error:
+                # писатель не должен умирать: иначе все следующие записи
+                # будут ждать таймаута
+                logger.exception('Failed to commit %s queued writes',
+                                 len(batch))
+                results = [(future, None, error) for future, *_ in batch]
+            except BaseException as error:
+                # SystemExit и подобные останавливают поток: ожидающие
+                # узнают об этом сразу, а следующая запись запустит
+                # новый писатель
+                for future, *_ in batch:
+                    future.set_exception(error)
+                raise
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+
+write_queue = WriteQueue()
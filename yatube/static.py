@@ -0,0 +1,94 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+from yatube.middleware import parse_accept_encoding
+
+BLOCK_SIZE = 64 * 1024
+# имя после ManifestStaticFilesStorage: name.0123456789ab.ext
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class StaticFilesApplication:
+    """
+    WSGI-обертка, которая отдает статику и медиа до Django. Тело отдается
+    через wsgi.file_wrapper, поэтому gunicorn использует sendfile.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.mounts = []
+        for url, root, max_age in (
+                (settings.STATIC_URL, settings.STATIC_ROOT,
+                 settings.STATIC_MAX_AGE),
+                (settings.MEDIA_URL, settings.MEDIA_ROOT,
+                 settings.MEDIA_MAX_AGE)):
+            if url and url.startswith('/') and root:
+                self.mounts.append((url, root, max_age))
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            # WSGI передает путь байтами UTF-8, прочитанными как latin-1
+            path = environ.get('PATH_INFO', '').encode('latin-1').decode(
+                'utf-8', 'replace')
+            for url, root, max_age in self.mounts:
+                if path.startswith(url):
+                    response = self.serve(environ, start_response, root,
+                                          path[len(url):], max_age)
+                    if response is not None:
+                        return response
+        return self.application(environ, start_response)
+
+    def serve(self, environ, start_response, root, name, max_age):
+        try:
+            path = safe_join(root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type, _ = mimetypes.guess_type(path)
+        headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', IMMUTABLE if HASHED_NAME.search(name)
+             else f'public, max-age={max_age}'),
+        ]
+
+        accepted = parse_accept_encoding(
+            environ.get('HTTP_ACCEPT_ENCODING', ''))
+        has_variants = False
+        etag_suffix = ''
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                has_variants = True
+                if accepted.get(encoding, 0) > 0:
+                    path += suffix
+                    etag_suffix = f'-{encoding}'
+                    headers.append(('Content-Encoding', encoding))
+                    break
+        if has_variants:
+            headers.append(('Vary', 'Accept-Encoding'))
+        # у каждого сжатого варианта свой ETag, иначе кэш может отдать
+        # по If-None-Match тело не в той кодировке
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{etag_suffix}"'
+        headers += [
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('ETag', etag),
+        ]
+        if etag in environ.get('HTTP_IF_NONE_MATCH', '').split(', '):
+            start_response('304 Not Modified', headers)
+            return []
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
@@ -0,0 +1,46 @@
+import gzip
+import os
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.txt', '.json',
+                           '.map', '.xml', '.ico', '.ttf', '.eot', '.otf')
+
+
+def write_compressed(path):
+    """
+    Пишет рядом с файлом .gz и .br версии, если они получаются меньше
+    оригинала.
+    """
+    with open(path, 'rb') as source:
+        content = source.read()
+    variants = [('.gz', lambda data: gzip.compress(data, 9, mtime=0)),
+                ('.br', brotli.compress)]
+    for suffix, compress in variants:
+        compressed = compress(content)
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Статика с хэшем содержимого в имени и заранее сжатыми копиями,
+    которые отдает yatube.static без сжатия на лету.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in processed_names:
+            if name and name.endswith(COMPRESSIBLE_EXTENSIONS):
+                path = self.path(name)
+                if os.path.exists(path):
+                    write_compressed(path)
@@ -1,23 +1,32 @@
 
 from django.contrib import admin
 from django.urls import path, include
-from django.contrib.flatpages import views
 from django.conf.urls import handler404, handler500 # noqa
-from django.conf import settings
-from django.conf.urls.static import static
+from posts import sitemaps
+from posts.flatpages import cached_flatpage
+from yatube import health, profiler, ratelimit
 
 handler404 = 'posts.views.page_not_found' # noqa
 handler500 = 'posts.views.server_error' # noqa
 
 urlpatterns = [
+    path('healthz/ready', health.ready, name='healthz_ready'),
+    path('sitemap.xml', sitemaps.sitemap_index, name='sitemap_index'),
+    path('sitemap-<slug:section>-<int:shard>.xml', sitemaps.sitemap_section,
+         name='sitemap_section'),
+    # до admin.site.urls, иначе адрес заберет админка
+    path('admin/profiler/', profiler.profiler_index, name='profiler_index'),
+    path('admin/profiler/<int:number>/', profiler.profiler_download,
+         name='profiler_download'),
+    path('admin/ratelimit/', ratelimit.ratelimit_metrics,
+         name='ratelimit_metrics'),
     path('admin/', admin.site.urls),
+    # до posts.urls, иначе адрес перехватит профиль '<str:username>/'
+    path('about-author/', cached_flatpage, {'url': '/about-author/'},
+         name='about_author'),
+    path('about-spec/', cached_flatpage, {'url': '/about-spec/'},
+         name='about_spec'),
     path('', include('posts.urls')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about-author/', views.flatpage, {'url': '/about-author/'}),
-    path('about-spec/', views.flatpage, {'url': '/about-spec/'}),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,72 @@
+"""
+Прогрев процесса до приема запросов: то, что иначе делает первый запрос
+каждого нового воркера.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+timings = {}
+_fork_hook_registered = False
+
+
+def populate_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict
+    reverse('index')
+
+
+def compile_templates():
+    for name in settings.WARMUP_TEMPLATES:
+        get_template(name)
+
+
+def connect_databases():
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def setup_thumbnails():
+    from sorl.thumbnail import default
+    # ленивые объекты sorl создаются при первом обращении к атрибуту
+    for lazy in (default.backend, default.engine, default.kvstore,
+                 default.storage):
+        lazy.__class__
+
+
+STAGES = [
+    ('urls', populate_urls),
+    ('templates', compile_templates),
+    ('database', connect_databases),
+    ('thumbnails', setup_thumbnails),
+]
+
+
+def run_stages():
+    """
+    Выполняет этапы прогрева и возвращает время каждого в секундах.
+    """
+    result = {}
+    for name, stage in STAGES:
+        started = time.perf_counter()
+        stage()
+        result[name] = time.perf_counter() - started
+    return result
+
+
+def run():
+    """
+    Прогревает процесс. Соединение с базой остается открытым для первого
+    запроса; если процесс потом форкается (gunicorn --preload), потомок
+    закрывает унаследованные соединения и открывает свои.
+    """
+    global _fork_hook_registered
+    timings.update(run_stages())
+    if not _fork_hook_registered:
+        os.register_at_fork(after_in_child=connections.close_all)
+        _fork_hook_registered = True
@@ -3,6 +3,11 @@ WSGI config for yatube project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+The process is warmed up before the callable is returned, so a new worker
+accepts traffic with URLs, templates and backends already loaded. Static and
+media files are served by the WSGI layer before requests reach Django.
+Buffered post views are written in the background only in this entry point.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
@@ -14,3 +19,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from posts.counters import view_counter  # noqa: E402
+from yatube import warmup  # noqa: E402
+from yatube.static import StaticFilesApplication  # noqa: E402
+
+application = StaticFilesApplication(application)
+
+view_counter.start()
+warmup.run()